@@ -0,0 +1,193 @@
+"""Load test: how much concurrent /research traffic one worker sustains.
+
+    cd backend
+    python -m bench.load [--concurrency 1,2,4,8,16,32] [--duration 10] [--out load.json]
+    python -m bench.load --latency-ms 80 --latency-sigma 0.6 --error-rate 0.02 \\
+        --page-kb 8:0.6,64:0.3,1024:0.1 --gemini-latency-ms 900
+
+Starts bench.standin (fake DuckDuckGo, article hosts and Gemini) in this process
+and the app as a single uvicorn worker in a subprocess, then runs one step per
+concurrency level: that many clients POST /research back to back with distinct
+queries for --duration seconds. Each step reports throughput, latency
+percentiles, error counts, and the worker's event-loop lag and memory. The run
+is written as JSON; "knee" is the highest concurrency whose p99 stayed under
+--p99-limit-ms.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+from bench.standin import StandinConfig, StandinServer
+from bench.stats import describe
+
+QUERIES = [
+    "python asyncio event loop",
+    "sqlite wal mode performance",
+    "how does asyncio actually work",
+    "sqlite write ahead log checkpoint",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def parse_page_sizes(spec: str) -> tuple:
+    """'8:0.6,64:0.4' -> ((8192, 0.6), (65536, 0.4))"""
+    sizes = []
+    for item in filter(None, spec.split(",")):
+        kb, _, weight = item.partition(":")
+        sizes.append((int(float(kb) * 1024), float(weight or 1)))
+    return tuple(sizes)
+
+
+def start_worker(standin_url: str, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "bench.serve", "--standin", standin_url, "--port", str(port)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, proc: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"worker exited with status {proc.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("worker did not start")
+
+
+async def run_step(client: httpx.AsyncClient, concurrency: int, duration: float, results: int, step: int) -> dict:
+    await client.post("/_bench/reset")
+    latencies, statuses = [], Counter()
+    counter = iter(range(10**9))
+    stop_at = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < stop_at:
+            n = next(counter)
+            text = f"{QUERIES[n % len(QUERIES)]} {step}-{n}"
+            t0 = time.perf_counter()
+            try:
+                r = await client.post("/research", json={"text": text, "num_results": results})
+                statuses[str(r.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    worker = (await client.get("/_bench/stats")).json()
+
+    ok = statuses.get("200", 0)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "statuses": dict(statuses),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(ok / elapsed, 2),
+        "latency": describe(latencies),
+        "loop_lag": worker["loop_lag"],
+        "memory": {"rss_mb": worker["rss_mb"], "peak_rss_mb": worker["peak_rss_mb"]},
+    }
+
+
+async def run(args, standin: StandinServer) -> dict:
+    port = free_port()
+    proc = start_worker(standin.url, port)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    steps = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client, proc)
+            for i, concurrency in enumerate(args.concurrency):
+                step = await run_step(client, concurrency, args.duration, args.results, i)
+                steps.append(step)
+                print(
+                    f"c={concurrency:<4} {step['throughput_rps']:>8.2f} req/s  "
+                    f"p50 {step['latency']['p50_ms']:>8.1f} ms  p99 {step['latency']['p99_ms']:>8.1f} ms  "
+                    f"errors {step['errors']:>4}  loop lag p99 {step['loop_lag']['p99_ms']:>6.1f} ms  "
+                    f"rss {step['memory']['rss_mb']} MB",
+                    file=sys.stderr,
+                )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    within = [s["concurrency"] for s in steps if s["latency"]["p99_ms"] <= args.p99_limit_ms]
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "config": {
+            "duration_s": args.duration,
+            "results": args.results,
+            "latency_ms": args.latency_ms,
+            "latency_sigma": args.latency_sigma,
+            "error_rate": args.error_rate,
+            "page_kb": args.page_kb,
+            "gemini_latency_ms": args.gemini_latency_ms,
+            "gemini_error_rate": args.gemini_error_rate,
+            "p99_limit_ms": args.p99_limit_ms,
+        },
+        "steps": steps,
+        "knee": max(within) if within else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--duration", type=float, default=10, help="seconds per concurrency step")
+    ap.add_argument("--results", type=int, default=5, help="num_results per request")
+    ap.add_argument("--latency-ms", type=float, default=50, help="median page and search latency")
+    ap.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal spread of that latency (0 = fixed)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of page and search requests that fail")
+    ap.add_argument("--page-kb", default="8:0.6,64:0.3,512:0.1", help="article size distribution, kb:weight,...")
+    ap.add_argument("--gemini-latency-ms", type=float, default=500)
+    ap.add_argument("--gemini-error-rate", type=float, default=0.0, help="share of Gemini requests answered 503")
+    ap.add_argument("--p99-limit-ms", type=float, default=5000, help="p99 that still counts as sustained")
+    ap.add_argument("--timeout", type=float, default=60, help="client timeout per request")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = ap.parse_args()
+
+    config = StandinConfig(
+        latency=args.latency_ms / 1000,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        gemini_latency=args.gemini_latency_ms / 1000,
+        gemini_error_rate=args.gemini_error_rate,
+        page_sizes=parse_page_sizes(args.page_kb),
+        seed=args.seed,
+    )
+    with StandinServer(config) as standin:
+        report = asyncio.run(run(args, standin))
+
+    out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
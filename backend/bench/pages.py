@@ -0,0 +1,71 @@
+"""The checked-in benchmark corpus.
+
+corpus/ holds DuckDuckGo result pages (ddg_*.html, ddg_lite_*.html for the lite
+layout) and article pages of various
+shapes: small, malformed, inline scripts between words, non-UTF-8 and non-HTML. manifest.json pins the
+Content-Type of some files and maps a few result URLs to specific files; every
+other URL maps to an article by a stable hash. One multi-megabyte page is
+generated on load rather than checked in.
+"""
+import json
+import zlib
+from pathlib import Path
+
+CORPUS = Path(__file__).parent / "corpus"
+HUGE_PAGE = "generated_huge.html"
+
+
+def generated_huge(copies: int = 2000) -> bytes:
+    news = (CORPUS / "article_news.html").read_bytes()
+    head, _, rest = news.partition(b"<main")
+    body, _, tail = rest.partition(b"</main>")
+    return head + (b"<main" + body + b"</main>") * copies + tail
+
+
+def generated_page(size: int) -> bytes:
+    """A news article repeated to roughly `size` bytes (at least one copy)."""
+    one = generated_huge(1)
+    main_block = len(generated_huge(2)) - len(one)
+    return generated_huge(max(1, 1 + (size - len(one)) // main_block))
+
+
+def load_manifest() -> dict:
+    return json.loads((CORPUS / "manifest.json").read_text(encoding="utf-8"))
+
+
+def load_pages() -> dict:
+    """file name -> bytes, including the generated huge page."""
+    pages = {p.name: p.read_bytes() for p in sorted(CORPUS.iterdir()) if p.name != "manifest.json"}
+    pages[HUGE_PAGE] = generated_huge()
+    return pages
+
+
+def content_type(name: str, manifest: dict) -> str:
+    return manifest["content_types"].get(name, "text/html; charset=utf-8")
+
+
+def search_pages(pages: dict, lite: bool = False) -> list:
+    return sorted(
+        name for name in pages
+        if name.startswith("ddg_") and name.startswith("ddg_lite_") == lite and "no_results" not in name
+    )
+
+
+def article_pages(pages: dict) -> list:
+    return sorted(name for name in pages if not name.startswith("ddg_"))
+
+
+def page_for_url(url: str, pages: dict, manifest: dict) -> str:
+    pinned = manifest["urls"].get(url)
+    if pinned:
+        return pinned
+    # generic URLs get ordinary HTML articles only, so timings stay comparable
+    names = [n for n in article_pages(pages) if n.endswith(".html") and n != HUGE_PAGE]
+    return names[zlib.crc32(url.encode()) % len(names)]
+
+
+def page_for_query(query: str, pages: dict, lite: bool = False) -> str:
+    if "no results" in query:
+        return "ddg_lite_no_results.html" if lite else "ddg_no_results.html"
+    names = search_pages(pages, lite)
+    return names[zlib.crc32(query.encode()) % len(names)]
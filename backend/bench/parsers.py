@@ -0,0 +1,116 @@
+"""Per-page parse time of every installed HTML parser backend.
+
+    cd backend
+    python -m bench.parsers [--repeat 20]
+
+Search-result pages (ddg_*.html) go through search_hits, with the lite layout
+for ddg_lite_*.html, everything else through extract_text. Each backend's output is compared with the html.parser reference;
+page text is checked against the original whole-document extractor below.
+Pages listed under "tag_soup" in the manifest only warn on a mismatch: each
+parser repairs broken markup its own way, so identical output is not expected.
+"""
+import argparse
+import statistics
+import time
+
+from bs4 import BeautifulSoup
+
+from parsing import DDG_HTML, DDG_LITE, MAIN_SELECTORS, REMOVED_TAGS, available_backends, decode_html
+from bench.pages import content_type, load_manifest, load_pages as load_corpus
+
+
+def load_pages():
+    manifest = load_manifest()
+    pages = []
+    for name, body in load_corpus().items():
+        ctype = content_type(name, manifest)
+        if "text/html" in ctype:
+            charset = ctype.partition("charset=")[2] or None
+            pages.append((name, decode_html(body, charset)))
+    return pages
+
+
+def reference_extract_text(html, max_length=8000):
+    """Whole-document extraction as extract_content did it before early exit."""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(REMOVED_TAGS):
+        tag.extract()
+
+    main = None
+    for sel in MAIN_SELECTORS:
+        found = soup.select(sel)
+        if found:
+            main = found
+            break
+
+    if main:
+        text = " ".join(sec.get_text(separator=" ", strip=True) for sec in main)
+    else:
+        paras = soup.find_all("p")
+        text = " ".join(p.get_text(strip=True) for p in paras) if paras else soup.get_text(separator=" ", strip=True)
+
+    text = " ".join(text.split())
+    return text[:max_length] + "..." if len(text) > max_length else text
+
+
+def layout(name):
+    return DDG_LITE if name.startswith("ddg_lite_") else DDG_HTML
+
+
+def parse(backend, name, html):
+    if name.startswith("ddg_"):
+        return backend.search_hits(html, 30, layout(name))
+    return backend.extract_text(html, 8000)
+
+
+def expected_output(reference, name, html):
+    if name.startswith("ddg_"):
+        return reference.search_hits(html, 30, layout(name))
+    return reference_extract_text(html, 8000)
+
+
+def time_page(backend, name, html, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        parse(backend, name, html)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=20, help="runs per page and backend (median is reported)")
+    args = ap.parse_args()
+
+    backends = available_backends()
+    reference = next(b for b in backends if b.name == "html.parser")
+    pages = load_pages()
+    tag_soup = set(load_manifest().get("tag_soup", ()))
+
+    width = max(len(name) for name, _ in pages)
+    print(f"{'page':<{width}}  {'KB':>6}  " + "  ".join(f"{b.name:>14}" for b in backends))
+    totals = {b.name: 0.0 for b in backends}
+    mismatches = []
+    for name, html in pages:
+        expected = expected_output(reference, name, html)
+        cells = []
+        for b in backends:
+            if parse(b, name, html) != expected:
+                mismatches.append((name, b.name))
+            t = time_page(b, name, html, args.repeat)
+            totals[b.name] += t
+            cells.append(f"{t * 1000:>11.2f} ms")
+        print(f"{name:<{width}}  {len(html.encode()) / 1024:>6.1f}  " + "  ".join(cells))
+
+    base = totals[reference.name]
+    print(f"{'total':<{width}}  {'':>6}  " + "  ".join(f"{totals[b.name] * 1000:>11.2f} ms" for b in backends))
+    print(f"{'speedup':<{width}}  {'':>6}  " + "  ".join(f"{base / totals[b.name]:>13.1f}x" for b in backends))
+    for name, backend in mismatches:
+        label = "note" if name in tag_soup else "MISMATCH"
+        print(f"{label}: {backend} differs from the reference output on {name}")
+    raise SystemExit(1 if any(name not in tag_soup for name, _ in mismatches) else 0)
+
+
+if __name__ == "__main__":
+    main()
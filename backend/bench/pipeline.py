@@ -0,0 +1,206 @@
+"""Per-stage and end-to-end latency of the research pipeline, fully offline.
+
+    cd backend
+    python -m bench.pipeline [--iterations 20] [--json]
+    python -m bench.pipeline --check            # exit 1 if slower than bench/baseline.json
+    python -m bench.pipeline --update-baseline  # record this machine's numbers
+
+DuckDuckGo, the article hosts and Gemini are replaced by bench.standin serving the
+corpus, and every cache is emptied between iterations, so each stage does its
+full work: search (fetch + parse a result page), extract (fetch + parse one
+article), parse (extract_text alone), summarize (one Gemini call), research (POST
+/research end to end) and throughput (concurrent /research requests per second).
+
+Baselines depend on the machine; record them where the check will run.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from bench.pages import article_pages, content_type
+from bench.standin import RoutedTransport, StandinConfig, StandinServer
+from bench.stats import describe
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+QUERIES = [
+    "python asyncio event loop",
+    "sqlite wal mode performance",
+    "how does asyncio actually work",
+    "sqlite write ahead log checkpoint",
+]
+
+
+def configure_env(standin_url: str, workdir: str):
+    """Point the app at the stand-in and throwaway databases; call before importing main."""
+    os.environ.update({
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_BASE_URL": standin_url,
+        "RESEARCH_DB": os.path.join(workdir, "research_history.db"),
+        "CONTENT_CACHE_PATH": os.path.join(workdir, "content_cache.db"),
+        "CONTENT_CACHE_MAX_AGE": "0",
+    })
+
+
+def clear_caches(main):
+    main.search_cache.clear()
+    main.summary_cache.clear()
+    main.content_cache.clear()
+    main.negative_cache.clear()
+
+
+async def timed(samples: list, coro):
+    t0 = time.perf_counter()
+    result = await coro
+    samples.append(time.perf_counter() - t0)
+    return result
+
+
+async def run(args, server: StandinServer):
+    import main
+
+    main._http_client = httpx.AsyncClient(
+        transport=RoutedTransport(server.url),
+        follow_redirects=True,
+        headers={"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip, br, zstd"},
+    )
+    main.on_startup()
+    pages, manifest = server.pages, server.manifest
+    html_pages = [n for n in article_pages(pages) if "text/html" in content_type(n, manifest)]
+    urls = sorted(set(manifest["urls"]) | {
+        hit["url"]
+        for q in QUERIES
+        for hit in await main.web_search(q, args.results)
+        if hit["url"].startswith("http")
+    })
+    transport = httpx.ASGITransport(app=main.app)
+    samples = {name: [] for name in ("search", "extract", "parse", "summarize", "research")}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as api:
+            for i in range(args.iterations):
+                clear_caches(main)
+                for q in QUERIES:
+                    await timed(samples["search"], main.web_search(f"{q} {i}", args.results))
+                for url in urls:
+                    await timed(samples["extract"], main.extract_content(url))
+                for name in html_pages:
+                    t0 = time.perf_counter()
+                    main.parse_page(pages[name], content_type(name, manifest).partition("charset=")[2] or None, 8000)
+                    samples["parse"].append(time.perf_counter() - t0)
+                for q in QUERIES:
+                    items = [{"title": f"{q} {i}", "url": url, "content": "text " * 500} for url in urls[:args.results]]
+                    await timed(samples["summarize"], main.summarize_content(q, items))
+                clear_caches(main)
+                for q in QUERIES:
+                    r = await timed(samples["research"], api.post("/research", json={"text": f"{q} {i}", "num_results": args.results}))
+                    r.raise_for_status()
+
+            clear_caches(main)
+            total = args.iterations * len(QUERIES)
+
+            async def one(n):
+                q = QUERIES[n % len(QUERIES)]
+                r = await api.post("/research", json={"text": f"{q} load {n}", "num_results": args.results})
+                r.raise_for_status()
+
+            sem = asyncio.Semaphore(args.concurrency)
+
+            async def bounded(n):
+                async with sem:
+                    await one(n)
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(bounded(n) for n in range(total)))
+            elapsed = time.perf_counter() - t0
+    finally:
+        await main.on_shutdown()
+
+    report = {stage: describe(s) for stage, s in samples.items()}
+    report["throughput"] = {
+        "requests": total,
+        "concurrency": args.concurrency,
+        "requests_per_s": round(total / elapsed, 2),
+    }
+    report["config"] = {
+        "iterations": args.iterations,
+        "results": args.results,
+        "parser": main.html_parser.name,
+        "latency_ms": args.latency,
+    }
+    return report
+
+
+def check(report: dict, baseline: dict, tolerance: float, slack_ms: float) -> list:
+    """Stages whose p50 or p95 grew, or whose throughput fell, beyond tolerance."""
+    failures = []
+    for stage, base in baseline.items():
+        if stage == "config" or stage not in report:
+            continue
+        if stage == "throughput":
+            floor = base["requests_per_s"] * (1 - tolerance)
+            if report[stage]["requests_per_s"] < floor:
+                failures.append(f"throughput {report[stage]['requests_per_s']} req/s < {floor:.2f} req/s")
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            limit = base[metric] * (1 + tolerance) + slack_ms
+            if report[stage][metric] > limit:
+                failures.append(f"{stage} {metric} {report[stage][metric]:.2f} > {limit:.2f}")
+    return failures
+
+
+def print_report(report: dict):
+    print(f"{'stage':<10}  {'count':>6}  {'mean':>9}  {'p50':>9}  {'p95':>9}  {'p99':>9}  {'max':>9}")
+    for stage, d in report.items():
+        if stage in ("throughput", "config"):
+            continue
+        cells = "  ".join(f"{d[k]:>6.2f} ms" for k in ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        print(f"{stage:<10}  {d['count']:>6}  {cells}")
+    t = report["throughput"]
+    print(f"throughput  {t['requests_per_s']} req/s ({t['requests']} requests, concurrency {t['concurrency']})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--iterations", type=int, default=20)
+    ap.add_argument("--results", type=int, default=5, help="num_results per query")
+    ap.add_argument("--concurrency", type=int, default=8, help="parallel requests in the throughput stage")
+    ap.add_argument("--latency", type=float, default=0.0, help="stand-in response delay in ms")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--check", action="store_true", help="compare against the stored baseline")
+    ap.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    ap.add_argument("--slack-ms", type=float, default=2.0, help="allowed absolute slowdown per stage")
+    args = ap.parse_args()
+
+    config = StandinConfig(latency=args.latency / 1000, gemini_latency=args.latency / 1000)
+    with StandinServer(config) as server, tempfile.TemporaryDirectory() as workdir:
+        configure_env(server.url, workdir)
+        # keep the app's own prints out of --json output
+        with contextlib.redirect_stdout(sys.stderr):
+            report = asyncio.run(run(args, server))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"baseline written to {BASELINE}")
+    if args.check:
+        failures = check(report, json.loads(BASELINE.read_text()), args.tolerance, args.slack_ms)
+        for failure in failures:
+            print("REGRESSION:", failure, file=sys.stderr)
+        raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""The app as one uvicorn worker wired to a bench.standin server, with probes.
+
+    python -m bench.serve --standin http://127.0.0.1:PORT [--port 8001]
+
+Started by bench.load; not meant for production. Besides the normal routes it
+serves GET /_bench/stats (event-loop lag and memory since the last reset) and
+POST /_bench/reset.
+"""
+import argparse
+import asyncio
+import resource
+import tempfile
+import time
+
+import httpx
+import uvicorn
+
+from bench.pipeline import configure_env
+from bench.standin import RoutedTransport
+from bench.stats import describe
+
+
+class LoopLagMonitor:
+    """Sleeps `interval` seconds in a loop and records how late each wake-up is.
+    Late wake-ups mean something held the event loop."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - t0 - self.interval))
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def peak_rss_bytes() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KiB on Linux
+
+
+def build_app(standin_url: str):
+    import main
+
+    main._http_client = httpx.AsyncClient(
+        transport=RoutedTransport(standin_url),
+        follow_redirects=True,
+        headers={"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip, br, zstd"},
+    )
+    lag = LoopLagMonitor()
+
+    @main.app.on_event("startup")
+    def start_probes():
+        lag.start()
+
+    @main.app.on_event("shutdown")
+    def stop_probes():
+        lag.stop()
+
+    @main.app.get("/_bench/stats")
+    def bench_stats():
+        return {
+            "loop_lag": describe(lag.samples),
+            "rss_mb": round(rss_bytes() / 2**20, 1),
+            "peak_rss_mb": round(peak_rss_bytes() / 2**20, 1),
+        }
+
+    @main.app.post("/_bench/reset")
+    def bench_reset():
+        lag.samples.clear()
+        main.search_cache.clear()
+        main.summary_cache.clear()
+        main.negative_cache.clear()
+        return {}
+
+    return main.app
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--standin", required=True, help="base URL of the bench.standin server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_env(args.standin, workdir)
+        app = build_app(args.standin)
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Local stand-ins for DuckDuckGo, article hosts and the Gemini API.
+
+One threaded HTTP server answers everything from the corpus:
+
+- /_/<scheme>/<host>/<path>: whatever the app asked <scheme>://<host>/<path> for.
+  DuckDuckGo searches (html and lite) get a result page picked by query, every other URL gets an
+  article (see bench.pages.page_for_url) with its manifest Content-Type.
+- /v1beta/models/<model>:generateContent and :streamGenerateContent: a fake
+  Gemini that returns a canned summary built from the prompt.
+
+RoutedTransport points the app's shared httpx client at /_/; GEMINI_BASE_URL
+points the Gemini SDK at the server root. Latency, error rate and article sizes
+are settable so the same stand-in serves the benchmarks and load tests.
+"""
+import json
+import random
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from bench.pages import content_type, generated_page, load_manifest, load_pages, page_for_query, page_for_url
+
+
+@dataclass
+class StandinConfig:
+    latency: float = 0.0         # seconds before each page or search response
+    jitter: float = 0.0          # extra uniform random delay, seconds
+    latency_sigma: float = 0.0   # >0 makes latency the median of a lognormal distribution
+    error_rate: float = 0.0      # share of page and search requests answered with a 503
+    gemini_latency: float = 0.0  # seconds before the first summary byte
+    gemini_chunks: int = 4       # streamed summary chunks
+    gemini_error_rate: float = 0.0  # share of Gemini requests answered with a 503 (overloaded)
+    page_sizes: tuple = ()       # ((bytes, weight), ...): serve generated HTML articles of these sizes
+    failing_hosts: tuple = ()    # article hosts that always answer 503
+    slow_hosts: tuple = ()       # ((host, seconds), ...): extra delay for these hosts
+    seed: int = 0
+
+
+class StandinServer:
+    def __init__(self, config: StandinConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StandinConfig()
+        self.pages = load_pages()
+        self.manifest = load_manifest()
+        self.requests = 0
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._sized = {}
+        self._httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def delay(self, base: float):
+        with self._lock:
+            self.requests += 1
+            if self.config.latency_sigma:
+                base *= self._random.lognormvariate(0, self.config.latency_sigma)
+            extra = self._random.uniform(0, self.config.jitter) if self.config.jitter else 0.0
+        if base + extra > 0:
+            time.sleep(base + extra)
+
+    def fails(self, rate: float = None) -> bool:
+        rate = self.config.error_rate if rate is None else rate
+        if not rate:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def resolve(self, target: str):
+        """(body, Content-Type) for an original absolute URL."""
+        parsed = urllib.parse.urlsplit(target)
+        if parsed.hostname and parsed.hostname.endswith("duckduckgo.com") and parsed.path.startswith(("/html", "/lite")):
+            query = urllib.parse.parse_qs(parsed.query).get("q", [""])[0]
+            name = page_for_query(query, self.pages, lite=parsed.path.startswith("/lite"))
+        else:
+            name = page_for_url(target, self.pages, self.manifest)
+            if self.config.page_sizes and "text/html" in content_type(name, self.manifest):
+                return self.sized_page(), "text/html; charset=utf-8"
+        return self.pages[name], content_type(name, self.manifest)
+
+    def sized_page(self) -> bytes:
+        sizes, weights = zip(*self.config.page_sizes)
+        with self._lock:
+            size = self._random.choices(sizes, weights)[0]
+            if size not in self._sized:
+                self._sized[size] = generated_page(size)
+            return self._sized[size]
+
+
+def fake_summary(prompt: str) -> str:
+    titles = [line[len("Title: "):] for line in prompt.splitlines() if line.startswith("Title: ")]
+    return "\n".join(f"- {title}: key points from the source." for title in titles) or "- No sources."
+
+
+def _gemini_response(text: str) -> bytes:
+    return json.dumps({
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+    }).encode()
+
+
+_GEMINI_OVERLOADED = json.dumps({
+    "error": {"code": 503, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE"},
+}).encode()
+
+
+def _handler(server: StandinServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes, ctype: str):
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the app cancelled the request (hedged search, deadline)
+
+        def do_GET(self):
+            if not self.path.startswith("/_/"):
+                return self._send(404, b"", "text/plain")
+            scheme, _, rest = self.path[3:].partition("/")
+            host = rest.partition("/")[0]
+            server.delay(server.config.latency + dict(server.config.slow_hosts).get(host, 0.0))
+            if server.fails() or host in server.config.failing_hosts:
+                return self._send(503, b"unavailable", "text/plain")
+            body, ctype = server.resolve(f"{scheme}://{rest}")
+            self._send(200, body, ctype)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            prompt = "".join(
+                part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", [])
+            )
+            summary = fake_summary(prompt)
+            server.delay(server.config.gemini_latency)
+            if server.fails(server.config.gemini_error_rate):
+                return self._send(503, _GEMINI_OVERLOADED, "application/json")
+            if ":streamGenerateContent" not in self.path:
+                return self._send(200, _gemini_response(summary), "application/json")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            n = max(1, server.config.gemini_chunks)
+            step = -(-len(summary) // n)
+            for i in range(0, len(summary), step):
+                event = b"data: " + _gemini_response(summary[i:i + step]) + b"\r\n\r\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.write(b"0\r\n\r\n")
+
+    return Handler
+
+
+class RoutedTransport(httpx.AsyncBaseTransport):
+    """Sends every request to the stand-in, keeping the original URL in the path."""
+
+    def __init__(self, base_url: str, **kwargs):
+        self.base_url = base_url
+        self._inner = httpx.AsyncHTTPTransport(**kwargs)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        target = f"{url.scheme}/{url.netloc.decode('ascii')}{url.raw_path.decode('ascii')}"
+        request.url = httpx.URL(f"{self.base_url}/_/{target}")
+        request.headers["Host"] = request.url.netloc.decode("ascii")
+        return await self._inner.handle_async_request(request)
+
+    async def aclose(self):
+        await self._inner.aclose()
@@ -0,0 +1,24 @@
+"""Latency summaries shared by the benchmark scripts."""
+import math
+
+
+def percentile(sorted_samples: list, p: float) -> float:
+    """Nearest-rank percentile of already sorted samples."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def describe(samples: list) -> dict:
+    """count/mean/p50/p95/p99/max of samples in seconds, reported in milliseconds."""
+    s = sorted(samples)
+    ms = lambda v: round(v * 1000, 3)
+    return {
+        "count": len(s),
+        "mean_ms": ms(sum(s) / len(s)) if s else 0.0,
+        "p50_ms": ms(percentile(s, 50)),
+        "p95_ms": ms(percentile(s, 95)),
+        "p99_ms": ms(percentile(s, 99)),
+        "max_ms": ms(s[-1]) if s else 0.0,
+    }
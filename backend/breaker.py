@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "probing")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker.
+
+    `failure_threshold` consecutive failures open a host's circuit, and `allow`
+    refuses it outright. After `reset_timeout` seconds one probe request is let
+    through (half-open): success closes the circuit, failure opens it for another
+    `reset_timeout`. Only hosts with recent failures are tracked, at most `maxsize`.
+    Not thread-safe: use it from the event loop only.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, maxsize: int = 4096):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.maxsize = maxsize
+        self._circuits = OrderedDict()
+        self.opened = 0
+        self.rejected = 0
+
+    def state(self, host: str) -> str:
+        c = self._circuits.get(host)
+        return c.state if c else CLOSED
+
+    def allow(self, host: str) -> bool:
+        c = self._circuits.get(host)
+        if c is None or c.state == CLOSED:
+            return True
+        if c.state == OPEN and time.monotonic() - c.opened_at >= self.reset_timeout:
+            c.state = HALF_OPEN
+        if c.state == HALF_OPEN and not c.probing:
+            c.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, host: str, ok: Optional[bool]):
+        """Report how a request that `allow` let through went; None if it was
+        abandoned (cancelled) before the host answered either way."""
+        c = self._circuits.get(host)
+        if ok is None:
+            if c is not None:
+                c.probing = False
+            return
+        if ok:
+            if c is not None:
+                del self._circuits[host]
+            return
+        if c is None:
+            c = self._circuits[host] = _Circuit()
+            while len(self._circuits) > self.maxsize:
+                self._circuits.popitem(last=False)
+        self._circuits.move_to_end(host)
+        c.failures += 1
+        c.probing = False
+        if c.state == HALF_OPEN or c.failures >= self.failure_threshold:
+            if c.state != OPEN:
+                self.opened += 1
+            c.state = OPEN
+            c.opened_at = time.monotonic()
+
+    def open_count(self) -> int:
+        # read by the OPEN_CIRCUITS gauge; /metrics renders on the event loop like
+        # every other caller, so nothing reshapes the dict mid-iteration
+        return sum(1 for c in self._circuits.values() if c.state != CLOSED)
+
+    def stats(self):
+        return {
+            "tracked": len(self._circuits),
+            "open": self.open_count(),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
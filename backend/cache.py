@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """In-memory LRU cache whose entries also expire `ttl` seconds after being set.
+
+    Besides the entry cap, `max_weight` bounds the summed `weigh(value)` of all
+    entries (e.g. total characters), evicting least recently used entries first.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0, max_weight=None, weigh=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+        self._data = OrderedDict()
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None, accept=None):
+        # `accept` lets callers reject a live entry (counted as a miss) without evicting it
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires, value = item
+        if expires <= time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return default
+        if accept is not None and not accept(value):
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.pop(key)
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires, value)
+        self.weight += self.weigh(value)
+        while self._data and (
+            len(self._data) > self.maxsize
+            or (self.max_weight is not None and self.weight > self.max_weight)
+        ):
+            _, (_, old) = self._data.popitem(last=False)
+            self.weight -= self.weigh(old)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        if item is None:
+            return default
+        self.weight -= self.weigh(item[1])
+        return item[1]
+
+    def clear(self):
+        self._data.clear()
+        self.weight = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "weight": self.weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,159 @@
+import sqlite3
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass
+from typing import Optional
+
+# Query parameters that never change the page content
+_TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so trivially different spellings share one cache entry."""
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = [
+        (k, v)
+        for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS
+    ]
+    query.sort()
+    return urllib.parse.urlunsplit(
+        (scheme, host, parts.path or "/", urllib.parse.urlencode(query), "")
+    )
+
+
+@dataclass
+class CachedContent:
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+    max_length: int
+
+
+class ContentCache:
+    """Disk-backed cache of extracted page text, keyed by canonical URL.
+
+    Entries younger than `max_age` seconds are served as-is; older ones keep their
+    ETag / Last-Modified so the caller can revalidate them with a conditional GET.
+    Once the stored text exceeds `max_bytes`, least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_age: float = 86400.0, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total_bytes = 0
+
+    def open(self):
+        with self._lock:
+            if self._conn is not None:
+                return
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS content_cache (
+                  url           TEXT PRIMARY KEY,
+                  text          TEXT NOT NULL,
+                  etag          TEXT,
+                  last_modified TEXT,
+                  max_length    INTEGER NOT NULL,
+                  size          INTEGER NOT NULL,
+                  fetched_at    REAL NOT NULL,
+                  accessed_at   REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_content_cache_accessed ON content_cache (accessed_at)"
+            )
+            conn.commit()
+            self._total_bytes = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM content_cache"
+            ).fetchone()[0]
+            self._conn = conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, url: str) -> Optional[CachedContent]:
+        self.open()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, etag, last_modified, fetched_at, max_length FROM content_cache WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE content_cache SET accessed_at = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+        return CachedContent(*row)
+
+    def is_fresh(self, entry: CachedContent) -> bool:
+        return time.time() - entry.fetched_at < self.max_age
+
+    def put(self, url: str, text: str, etag: Optional[str], last_modified: Optional[str], max_length: int):
+        self.open()
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM content_cache WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO content_cache "
+                "(url, text, etag, last_modified, max_length, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, text, etag, last_modified, max_length, size, now, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """Record a successful revalidation (304): the stored text is fresh again."""
+        self.open()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE content_cache SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                (now, now, url),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        self.open()
+        with self._lock:
+            self._conn.execute("DELETE FROM content_cache")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, size FROM content_cache ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for url, size in rows:
+                self._conn.execute("DELETE FROM content_cache WHERE url = ?", (url,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM content_cache").fetchone()[0] if self._conn else 0
+        return {"entries": count, "bytes": self._total_bytes, "max_bytes": self.max_bytes}
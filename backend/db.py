@@ -0,0 +1,479 @@
+import base64
+import functools
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Optional
+
+from metrics import ERRORS, HISTORY_BLOCKED, HISTORY_FAILED, SQLITE_SECONDS
+
+# — Connection management —
+# One long-lived connection per thread (the blocking pool reuses its threads), all
+# in WAL mode so readers never wait on the writer and commits skip the rollback journal.
+DB = "research_history.db"
+
+PRAGMAS = [
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+]
+
+_local = threading.local()
+_conns = []
+_conns_lock = threading.Lock()
+_generation = 0  # bumped by close_all so threads drop their stale connections
+
+
+# A run's summary, titles and snippets are compressed together as one document:
+# a snippet barely shrinks on its own, but the five or ten of one run share
+# most of their vocabulary
+def compress_doc(summary: str, titles: list, snippets: list) -> bytes:
+    doc = json.dumps([summary, titles, snippets], ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(doc.encode("utf-8"), 9)
+
+
+@functools.lru_cache(maxsize=256)
+def decompress_doc(blob: bytes):
+    """(summary, titles, snippets) of a compress_doc blob."""
+    summary, titles, snippets = json.loads(zlib.decompress(blob))
+    return summary, tuple(titles), tuple(snippets)
+
+
+def doc_text(blob: Optional[bytes], field: str) -> Optional[str]:
+    """SQL doc_text(doc, 'summary' | 'titles' | 'snippets'); lists are joined by spaces."""
+    if blob is None:
+        return None
+    summary, titles, snippets = decompress_doc(blob)
+    if field == "summary":
+        return summary
+    return " ".join(titles if field == "titles" else snippets)
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or DB, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    # lets SQL (and the FTS content view) read the compressed run documents
+    conn.create_function("doc_text", 2, doc_text, deterministic=True)
+    return conn
+
+
+def get_conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        conn = connect()
+        _local.conn = conn
+        _local.generation = _generation
+        with _conns_lock:
+            _conns.append(conn)
+    return conn
+
+
+def close_all():
+    global _generation
+    with _conns_lock:
+        _generation += 1
+        for conn in _conns:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                pass  # owned by a thread that already exited
+        _conns.clear()
+
+
+# — Schema migrations —
+def _normalize_history(conn: sqlite3.Connection):
+    """Split the per-row JSON blob into urls / research_results / research_docs
+    and rebuild the FTS index as an external-content index over them."""
+    # each distinct result URL is stored once
+    conn.execute("""
+        CREATE TABLE urls (
+          id  INTEGER PRIMARY KEY,
+          url TEXT NOT NULL UNIQUE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE research_results (
+          research_id INTEGER NOT NULL REFERENCES research_history (id),
+          rank        INTEGER NOT NULL,
+          url_id      INTEGER NOT NULL REFERENCES urls (id),
+          PRIMARY KEY (research_id, rank)
+        ) WITHOUT ROWID
+    """)
+    # summary, titles and snippets of a run as one compress_doc blob
+    conn.execute("""
+        CREATE TABLE research_docs (
+          research_id INTEGER PRIMARY KEY REFERENCES research_history (id),
+          doc         BLOB NOT NULL
+        )
+    """)
+    # the FTS index keeps no copy of the text; highlight()/snippet() read it back through this view
+    conn.execute("""
+        CREATE VIEW research_fts_source AS
+        SELECT h.id AS id, h.query AS query,
+          doc_text(d.doc, 'summary') AS summary,
+          doc_text(d.doc, 'titles') AS titles,
+          doc_text(d.doc, 'snippets') AS snippets
+        FROM research_history h LEFT JOIN research_docs d ON d.research_id = h.id
+    """)
+    rows = conn.execute("SELECT id, results FROM research_history").fetchall()
+    for rid, results in rows:
+        _insert_payload(conn, rid, json.loads(results))
+    conn.execute("ALTER TABLE research_history DROP COLUMN results")
+    conn.execute("DROP TABLE research_fts")
+    conn.execute("""
+        CREATE VIRTUAL TABLE research_fts USING fts5(
+          query, summary, titles, snippets,
+          content = 'research_fts_source', content_rowid = 'id',
+          tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("INSERT INTO research_fts (research_fts) VALUES ('rebuild')")
+
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS research_history (
+      id        INTEGER PRIMARY KEY AUTOINCREMENT,
+      query     TEXT NOT NULL,
+      results   TEXT NOT NULL,
+      timestamp TEXT NOT NULL
+    )
+    """,
+    # keyset pagination walks this index newest-first
+    """
+    CREATE INDEX IF NOT EXISTS idx_research_history_ts_id
+      ON research_history (timestamp DESC, id DESC)
+    """,
+    # full-text index over past research; rowid = research_history.id
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS research_fts USING fts5(
+      query, summary, titles, snippets,
+      tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    # one-time backfill of rows saved before the index existed
+    """
+    INSERT INTO research_fts (rowid, query, summary, titles, snippets)
+    SELECT id, query, json_extract(results, '$.summary'),
+      (SELECT group_concat(json_extract(value, '$.title'), ' ') FROM json_each(results, '$.results')),
+      (SELECT group_concat(json_extract(value, '$.snippet'), ' ') FROM json_each(results, '$.results'))
+    FROM research_history
+    """,
+    _normalize_history,
+]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply pending migrations, each in its own transaction; returns how many ran."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for i, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            conn.execute("BEGIN")
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {i}")
+    return max(0, len(MIGRATIONS) - version)
+
+
+def init_db(path: Optional[str] = None):
+    global DB
+    if path:
+        DB = path
+    conn = connect()
+    conn.execute("PRAGMA journal_mode=WAL")
+    if migrate(conn):
+        # give back the pages freed by rewritten tables
+        conn.execute("VACUUM")
+    conn.close()
+
+
+# — Queries —
+def _url_id(conn: sqlite3.Connection, url: str) -> int:
+    return conn.execute(
+        "INSERT INTO urls (url) VALUES (?) "
+        "ON CONFLICT (url) DO UPDATE SET url = excluded.url RETURNING id",
+        (url,),
+    ).fetchone()[0]
+
+
+def _insert_payload(conn: sqlite3.Connection, rid: int, payload: dict):
+    results = payload.get("results", [])
+    for rank, r in enumerate(results):
+        conn.execute(
+            "INSERT INTO research_results (research_id, rank, url_id) VALUES (?, ?, ?)",
+            (rid, rank, _url_id(conn, r.get("url", ""))),
+        )
+    conn.execute(
+        "INSERT INTO research_docs (research_id, doc) VALUES (?, ?)",
+        (rid, compress_doc(
+            payload.get("summary", ""),
+            [r.get("title", "") for r in results],
+            [r.get("snippet", "") for r in results],
+        )),
+    )
+
+
+def _insert_research(conn: sqlite3.Connection, query: str, payload: dict, ts: str) -> int:
+    cur = conn.execute(
+        "INSERT INTO research_history (query, timestamp) VALUES (?, ?)",
+        (query, ts)
+    )
+    rid = cur.lastrowid
+    _insert_payload(conn, rid, payload)
+    # kept in sync in the same transaction, so the index never needs a rescan
+    results = payload.get("results", [])
+    conn.execute(
+        "INSERT INTO research_fts (rowid, query, summary, titles, snippets) VALUES (?, ?, ?, ?, ?)",
+        (
+            rid,
+            query,
+            payload.get("summary", ""),
+            " ".join(r.get("title", "") for r in results),
+            " ".join(r.get("snippet", "") for r in results),
+        ),
+    )
+    return rid
+
+
+@SQLITE_SECONDS.labels("write").time()
+def save_research_batch(items):
+    """Insert (query, payload, ts) rows in a single transaction; returns their ids."""
+    conn = get_conn()
+    with conn:
+        return [_insert_research(conn, query, payload, ts) for query, payload, ts in items]
+
+
+# — Write-behind persistence —
+class HistoryWriter:
+    """Background thread that persists history rows off the request path.
+
+    Rows queue up in a bounded queue and are written in batches, one transaction
+    (and one fsync) per batch. When the queue is full, `submit` blocks the calling
+    thread until the writer catches up; those events are counted in `blocked`.
+    `submit` may be called from any thread.
+    """
+
+    def __init__(self, maxsize: int = 1000, batch_size: int = 100, linger: float = 0.01):
+        self.batch_size = batch_size
+        self.linger = linger
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._lock = threading.Lock()  # guards the counters below
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.blocked = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, query: str, payload: dict, block: bool = True) -> Future:
+        """Queue a row; the returned future resolves to its id once committed.
+        With block=False a full queue raises queue.Full instead of waiting."""
+        fut = Future()
+        item = (query, payload, datetime.now().isoformat(), fut)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            if not block:
+                raise
+            with self._lock:
+                self.blocked += 1
+            HISTORY_BLOCKED.inc()
+            self._queue.put(item)
+        with self._lock:
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return fut
+
+    def stop(self):
+        """Flush everything queued so far, then stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            ids = save_research_batch([(q, p, ts) for q, p, ts, _ in batch])
+        except Exception as e:
+            print("History write error:", e)
+            ERRORS.labels("save").inc()
+            HISTORY_FAILED.inc(len(batch))
+            with self._lock:
+                self.failed += len(batch)
+            for *_, fut in batch:
+                fut.set_exception(e)
+            return
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+        for (*_, fut), rid in zip(batch, ids):
+            fut.set_result(rid)
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "max_depth": self.max_depth,
+                "maxsize": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "batches": self.batches,
+                "blocked": self.blocked,
+                "failed": self.failed,
+            }
+
+
+def encode_cursor(ts: str, rid: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts}|{rid}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, rid = raw.rsplit("|", 1)
+        return ts, int(rid)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+@SQLITE_SECONDS.labels("history").time()
+def get_research_history(limit: int = 20, cursor: Optional[str] = None, summary_chars: int = 0):
+    """One page of history (newest first) as id/query/timestamp rows, plus the
+    cursor for the next page. Full payloads are only read by get_research_by_id."""
+    cols = "id, query, timestamp"
+    params = []
+    if summary_chars > 0:
+        # one extra char tells us whether the summary was cut
+        cols += (
+            ", (SELECT substr(doc_text(d.doc, 'summary'), 1, ?) FROM research_docs d"
+            " WHERE d.research_id = research_history.id) AS summary"
+        )
+        params.append(summary_chars + 1)
+    where = ""
+    if cursor:
+        where = "WHERE (timestamp, id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    params.append(limit + 1)
+
+    rows = get_conn().execute(
+        f"SELECT {cols} FROM research_history {where} "
+        "ORDER BY timestamp DESC, id DESC LIMIT ?",
+        params,
+    ).fetchall()
+
+    items = []
+    for r in rows[:limit]:
+        rec = dict(r)
+        summary = rec.get("summary")
+        if summary and len(summary) > summary_chars:
+            rec["summary"] = summary[:summary_chars] + "..."
+        items.append(rec)
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["timestamp"], last["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def fts_match_expr(text: str) -> str:
+    """Turn free user text into a safe FTS5 query: every word must match, the
+    last one as a prefix so results show up while the user is still typing."""
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        raise ValueError("Search text must contain at least one word")
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+@SQLITE_SECONDS.labels("search").time()
+def search_research(text: str, limit: int = 20, offset: int = 0):
+    """Rank past research by bm25 (query text weighted highest, then summary,
+    titles, snippets) and return highlighted matches one page at a time."""
+    rows = get_conn().execute(
+        """
+        SELECT h.id, h.query, h.timestamp,
+          highlight(research_fts, 0, '<mark>', '</mark>') AS query_highlight,
+          snippet(research_fts, -1, '<mark>', '</mark>', '…', 24) AS snippet,
+          bm25(research_fts, 4.0, 2.0, 1.5, 1.0) AS score
+        FROM research_fts
+        JOIN research_history h ON h.id = research_fts.rowid
+        WHERE research_fts MATCH ?
+        ORDER BY score
+        LIMIT ? OFFSET ?
+        """,
+        (fts_match_expr(text), limit + 1, offset),
+    ).fetchall()
+    items = [dict(r) for r in rows[:limit]]
+    next_offset = offset + limit if len(rows) > limit else None
+    return {"items": items, "next_offset": next_offset}
+
+
+@SQLITE_SECONDS.labels("item").time()
+def get_research_by_id(rid: int):
+    conn = get_conn()
+    row = conn.execute("SELECT id, query, timestamp FROM research_history WHERE id = ?", (rid,)).fetchone()
+    if not row:
+        return None
+    urls = [r[0] for r in conn.execute(
+        """
+        SELECT u.url FROM research_results r JOIN urls u ON u.id = r.url_id
+        WHERE r.research_id = ?
+        ORDER BY r.rank
+        """,
+        (rid,),
+    )]
+    doc = conn.execute("SELECT doc FROM research_docs WHERE research_id = ?", (rid,)).fetchone()
+    summary, titles, snippets = decompress_doc(doc[0]) if doc else ("", (), ())
+    rec = dict(row)
+    rec["results"] = {
+        "query": rec["query"],
+        "results": [
+            {"title": title, "url": url, "snippet": snippet}
+            for title, url, snippet in zip(titles, urls, snippets)
+        ],
+        "summary": summary,
+    }
+    return rec
@@ -0,0 +1,27 @@
+import time
+from typing import Optional
+
+
+class Deadline:
+    """A point in time by which a request must be answered.
+
+    `reserve` seconds at the end are kept for the last stage (the summary), so
+    the stages before it budget against `expires_at - reserve` only. The reserve
+    is at most half of the total, so short deadlines still leave room to search.
+    """
+
+    def __init__(self, seconds: float, reserve: float = 0.0):
+        self.seconds = seconds
+        self.reserve = min(reserve, seconds / 2)
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, cap: Optional[float] = None, reserved: bool = True) -> float:
+        """Seconds the next stage may take: what is left (minus the reserve unless
+        `reserved` is False), but never more than `cap`."""
+        left = self.remaining() - (self.reserve if reserved else 0.0)
+        if cap is not None:
+            left = min(left, cap)
+        return max(0.0, left)
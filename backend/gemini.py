@@ -0,0 +1,207 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+from google import genai
+from google.genai import errors
+
+from metrics import GEMINI_QUEUE_SECONDS, GEMINI_RETRIES
+
+# kinds of SummaryError
+DEADLINE_EXCEEDED = "deadline_exceeded"  # the request's time budget ran out
+RATE_LIMITED = "rate_limited"            # 429, quota exhausted
+UNAVAILABLE = "unavailable"              # 5xx, timeouts and connection errors
+REJECTED = "rejected"                    # other 4xx: bad key, bad request, unknown model
+EMPTY = "empty"                          # an answer without text, e.g. blocked by safety filters
+FAILED = "failed"                        # anything else
+
+RETRYABLE = {RATE_LIMITED, UNAVAILABLE}
+
+
+class SummaryError(Exception):
+    """A summary that could not be produced, reported next to (not inside) the summary text."""
+
+    def __init__(self, kind: str, message: str, status: Optional[int] = None, attempts: int = 1):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.status = status
+        self.attempts = attempts
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in RETRYABLE
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "message": self.message,
+            "status": self.status,
+            "retryable": self.retryable,
+            "attempts": self.attempts,
+        }
+
+
+def classify(e: Exception) -> SummaryError:
+    if isinstance(e, SummaryError):
+        return e
+    if isinstance(e, TimeoutError):
+        return SummaryError(DEADLINE_EXCEEDED, "deadline exceeded")
+    if isinstance(e, errors.APIError):
+        message = e.message or str(e)
+        if e.code == 429:
+            return SummaryError(RATE_LIMITED, message, e.code)
+        if e.code in (408, 500, 502, 503, 504):
+            return SummaryError(UNAVAILABLE, message, e.code)
+        if 400 <= (e.code or 0) < 500:
+            return SummaryError(REJECTED, message, e.code)
+        return SummaryError(FAILED, message, e.code)
+    if isinstance(e, (httpx.TimeoutException, httpx.TransportError)):
+        return SummaryError(UNAVAILABLE, f"{type(e).__name__}: {e}")
+    return SummaryError(FAILED, f"{type(e).__name__}: {e}")
+
+
+def retry_after(e: Exception) -> float:
+    """Seconds the server asked us to wait (Retry-After), else 0."""
+    response = getattr(e, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+class GeminiClient:
+    """One google-genai client for the process, with a concurrency cap and retries.
+
+    The SDK client owns an httpx connection pool, so it is built once at startup
+    and reused rather than paying for a new pool and TLS handshake per summary.
+    At most `concurrency` requests are in flight (size it to the API quota);
+    callers beyond that queue. Rate-limit and availability errors are retried
+    up to `max_attempts` times with full-jitter exponential backoff, as long as
+    the caller's timeout leaves room. Every failure surfaces as a SummaryError.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: Optional[str] = None,
+        concurrency: int = 8,
+        max_attempts: int = 3,
+        backoff: float = 0.5,
+        backoff_max: float = 8.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._limit = asyncio.Semaphore(concurrency)
+        self._client = None
+        self._error = None  # why the SDK client could not be built
+        self.retries = 0
+
+    def start(self):
+        """Build the SDK client. A missing or unusable API key does not stop the
+        app from starting; each summary then fails as REJECTED instead."""
+        if self._client is None and self._error is None:
+            http_options = {"base_url": self.base_url} if self.base_url else None
+            try:
+                if not self.api_key:
+                    # refused up front: a half-built SDK client logs errors when collected
+                    raise ValueError("GEMINI_API_KEY is not set")
+                self._client = genai.Client(api_key=self.api_key, http_options=http_options)
+            except ValueError as e:
+                print("Gemini client unavailable:", e)
+                self._error = str(e)
+
+    async def aclose(self):
+        client, self._client = self._client, None
+        if client is not None and hasattr(client.aio, "aclose"):  # older google-genai releases lack it
+            await client.aio.aclose()
+
+    @property
+    def models(self):
+        self.start()
+        if self._client is None:
+            raise SummaryError(REJECTED, f"Gemini client unavailable: {self._error}")
+        return self._client.aio.models
+
+    def _delay(self, attempt: int, e: Exception) -> float:
+        jitter = random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+        return max(min(retry_after(e), self.backoff_max), jitter)
+
+    async def _backoff(self, attempt: int, e: Exception, expires: Optional[float]):
+        """Sleep before attempt `attempt + 1`; raises the classified error if
+        it is final, not retryable, or there is no time left to retry."""
+        err = classify(e)
+        err.attempts = attempt
+        if not err.retryable or attempt >= self.max_attempts:
+            raise err from e
+        delay = self._delay(attempt, e)
+        loop = asyncio.get_running_loop()
+        if expires is not None and loop.time() + delay >= expires:
+            raise err from e
+        GEMINI_RETRIES.labels(err.kind).inc()
+        self.retries += 1
+        await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def _slot(self, expires: Optional[float]):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            async with asyncio.timeout_at(expires):
+                await self._limit.acquire()
+        except TimeoutError:
+            raise SummaryError(DEADLINE_EXCEEDED, "deadline exceeded waiting for a Gemini slot", attempts=0)
+        GEMINI_QUEUE_SECONDS.observe(loop.time() - started)
+        try:
+            yield
+        finally:
+            self._limit.release()
+
+    async def generate(self, model: str, contents: str, timeout: Optional[float] = None) -> str:
+        loop = asyncio.get_running_loop()
+        expires = None if timeout is None else loop.time() + timeout
+        async with self._slot(expires):
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    async with asyncio.timeout_at(expires):
+                        response = await self.models.generate_content(model=model, contents=contents)
+                except Exception as e:
+                    await self._backoff(attempt, e, expires)
+                    continue
+                text = (response.text or "").strip()
+                if not text:
+                    raise SummaryError(EMPTY, "Gemini returned no text", attempts=attempt)
+                return text
+
+    async def stream(self, model: str, contents: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield text chunks. Only failures before the first chunk are retried;
+        after that a retry would repeat text the caller already has. The caller
+        enforces `timeout` between chunks; here it bounds waiting and backoff."""
+        loop = asyncio.get_running_loop()
+        expires = None if timeout is None else loop.time() + timeout
+        async with self._slot(expires):
+            for attempt in range(1, self.max_attempts + 1):
+                sent = False
+                try:
+                    async for chunk in await self.models.generate_content_stream(model=model, contents=contents):
+                        if chunk.text:
+                            sent = True
+                            yield chunk.text
+                except Exception as e:
+                    if sent:
+                        err = classify(e)
+                        err.attempts = attempt
+                        raise err from e
+                    await self._backoff(attempt, e, expires)
+                    continue
+                if not sent:
+                    raise SummaryError(EMPTY, "Gemini returned no text", attempts=attempt)
+                return
+
+    def stats(self):
+        return {"retries": self.retries}
@@ -1,17 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query as QueryParam
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import queue
 import uvicorn
-import requests
-from bs4 import BeautifulSoup
+import httpx
 import urllib.parse
-from google import genai
 import os
-import sqlite3
 import json
-from datetime import datetime
+import hashlib
+import time
 from dotenv import load_dotenv
+from cache import TTLCache
+from content_cache import ContentCache, canonical_url
+from singleflight import SingleFlight
+from politeness import HostScheduler
+from breaker import CircuitBreaker
+from deadline import Deadline
+from gemini import DEADLINE_EXCEEDED, GeminiClient, SummaryError
+from search_providers import HedgedSearch, providers_from_env
+from tracing import Tracer, InMemoryExporter, exporter_from_env, new_trace_id
+from metrics import (
+    SEARCH_SECONDS, SEARCH_HEDGES, SEARCH_WINS, FETCH_QUEUE_SECONDS, FETCH_SECONDS, FETCH_BYTES, PARSE_SECONDS, GEMINI_SECONDS, PROMPT_CHARS,
+    SNIPPET_FALLBACKS, CACHE_LOOKUPS, ERRORS, FETCH_SKIPPED, OPEN_CIRCUITS, HISTORY_QUEUE_DEPTH, FETCHES_CANCELLED, render as render_metrics,
+)
+from parsing import select_backend, decode_html
+from db import (
+    init_db, get_research_history, get_research_by_id, search_research,
+    close_all as close_db, HistoryWriter,
+)
 
 # Load env
 load_dotenv()
@@ -19,6 +40,78 @@ load_dotenv()
 # Configure your API key
 API_KEY = os.getenv("GEMINI_API_KEY")
 MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-001")
+# Alternate API endpoint, e.g. a proxy or the offline stand-in in bench/standin.py
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+# Summaries in flight at once (size to the API quota), and tries per summary
+# for rate-limit and availability errors
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+GEMINI_MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+GEMINI_BACKOFF = float(os.getenv("GEMINI_BACKOFF", "0.5"))
+
+gemini = GeminiClient(
+    API_KEY, GEMINI_BASE_URL,
+    concurrency=GEMINI_CONCURRENCY, max_attempts=GEMINI_MAX_ATTEMPTS, backoff=GEMINI_BACKOFF,
+)
+
+# Blocking work (HTML parsing, SQLite) runs on a bounded pool so the event loop stays free
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "8"))
+_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="research")
+
+# Page fetches in flight across all requests, per host, and the minimum gap
+# between two fetches starting against the same host
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "16"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "2"))
+FETCH_HOST_INTERVAL = float(os.getenv("FETCH_HOST_INTERVAL", "0.1"))
+fetch_scheduler = HostScheduler(FETCH_CONCURRENCY, FETCH_PER_HOST, FETCH_HOST_INTERVAL)
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+# — Tracing —
+# Each /research call is one trace; TRACE_EXPORTER picks where finished traces go
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "memory")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "1000"))
+
+tracer = Tracer(exporter_from_env(TRACE_EXPORTER, TRACE_FILE, TRACE_BUFFER))
+
+def host_of(url: str) -> Optional[str]:
+    try:
+        return urllib.parse.urlsplit(url).hostname
+    except ValueError:  # e.g. an unclosed IPv6 bracket
+        return None
+
+# — Shared HTTP client —
+# One pooled client for DuckDuckGo and article hosts so repeat requests reuse warm
+# keep-alive (and HTTP/2 where offered) connections instead of new TCP/TLS handshakes
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "40"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2 = os.getenv("HTTP2", "1") == "1"
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=HTTP2,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            headers={"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip, br, zstd"},
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
 
 app = FastAPI(title="Research Agent API")
 
@@ -28,149 +121,360 @@ app.add_middleware(
     allow_origins=["http://localhost:3000"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
 # — Pydantic models —
 class Query(BaseModel):
     text: str
     num_results: Optional[int] = 5
+    # seconds to answer within; RESEARCH_DEADLINE if omitted, capped at RESEARCH_DEADLINE_MAX
+    deadline: Optional[float] = Field(None, gt=0)
 
 class SearchResult(BaseModel):
     title: str
     url: str
     snippet: str
 
+class SummaryFailure(BaseModel):
+    kind: str  # deadline_exceeded, rate_limited, unavailable, rejected, empty, failed
+    message: str
+    status: Optional[int] = None
+    retryable: bool
+    attempts: int
+
 class ResearchResponse(BaseModel):
     query: str
     results: List[SearchResult]
     summary: str
+    # set (and summary empty or partial) when Gemini could not summarize
+    summary_error: Optional[SummaryFailure] = None
 
 # — SQLite setup —
-DB = "research_history.db"
-
-def init_db():
-    conn = sqlite3.connect(DB, check_same_thread=False)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS research_history (
-          id        INTEGER PRIMARY KEY AUTOINCREMENT,
-          query     TEXT NOT NULL,
-          results   TEXT NOT NULL,
-          timestamp TEXT NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def save_research(query: str, payload: dict):
-    conn = sqlite3.connect(DB, check_same_thread=False)
-    cur = conn.cursor()
-    ts = datetime.now().isoformat()
-    cur.execute(
-        "INSERT INTO research_history (query, results, timestamp) VALUES (?, ?, ?)",
-        (query, json.dumps(payload), ts)
-    )
-    conn.commit()
-    conn.close()
-
-def get_research_history():
-    conn = sqlite3.connect(DB, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM research_history ORDER BY timestamp DESC")
-    rows = cur.fetchall()
-    conn.close()
-    out = []
-    for r in rows:
-        rec = dict(r)
-        rec["results"] = json.loads(rec["results"])
-        out.append(rec)
-    return out
-
-def get_research_by_id(rid: int):
-    conn = sqlite3.connect(DB, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM research_history WHERE id = ?", (rid,))
-    row = cur.fetchone()
-    conn.close()
-    if not row:
-        return None
-    rec = dict(row)
-    rec["results"] = json.loads(rec["results"])
-    return rec
+DB = os.getenv("RESEARCH_DB", "research_history.db")
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", "1000"))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "100"))
+
+# History rows are written behind the response by a group-committing writer thread
+history_writer = HistoryWriter(maxsize=HISTORY_QUEUE_SIZE, batch_size=HISTORY_BATCH_SIZE)
+HISTORY_QUEUE_DEPTH.set_function(history_writer.depth)
+
+async def save_research(query: str, payload: dict):
+    """Queue a history row and return a future for its id without waiting on disk.
+    Only a full queue makes this wait (on the blocking pool, not the event loop)."""
+    try:
+        return history_writer.submit(query, payload, block=False)
+    except queue.Full:
+        return await run_blocking(history_writer.submit, query, payload)
 
 @app.on_event("startup")
 def on_startup():
-    init_db()
+    print("HTML parser:", html_parser.name)
+    init_db(DB)
+    history_writer.start()
+    content_cache.open()
+    get_http_client()
+    gemini.start()
 
-# — DuckDuckGo scraping —
-def search_duckduckgo(query: str, num_results: int = 5):
-    q = urllib.parse.quote_plus(query)
-    url = f"https://html.duckduckgo.com/html/?q={q}"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    try:
-        r = requests.get(url, headers=headers, timeout=10)
-        r.raise_for_status()
-    except Exception as e:
-        print("DuckDuckGo error:", e)
-        return []
+@app.on_event("shutdown")
+async def on_shutdown():
+    await close_http_client()
+    await gemini.aclose()
+    _executor.shutdown(wait=True)
+    tracer.shutdown()
+    history_writer.stop()
+    content_cache.close()
+    close_db()
 
-    soup = BeautifulSoup(r.text, "html.parser")
-    hits = []
-    for block in soup.select(".result"):
-        link = block.select_one(".result__title a")
-        if not link:
-            continue
-        title = link.get_text(strip=True)
-        raw = link.get("href", "")
-        if raw.startswith("/l/"):
-            parsed = urllib.parse.urlparse(raw)
-            qs = urllib.parse.parse_qs(parsed.query)
-            href = qs.get("uddg", [raw])[0]
-        else:
-            href = raw
-        snippet_el = block.select_one(".result__snippet")
-        snippet = snippet_el.get_text(strip=True) if snippet_el else ""
-        hits.append({"title": title, "url": href, "snippet": snippet})
-        if len(hits) >= num_results:
-            break
+# — HTML parsing —
+# Unset means the fastest installed backend (lexbor, then lxml, then html.parser)
+HTML_PARSER = os.getenv("HTML_PARSER")
+html_parser = select_backend(HTML_PARSER)
+
+# — Web search —
+SEARCH_TIMEOUT = 10.0
+# Providers in order of preference: ddg_html, ddg_lite, or any name defined in
+# SEARCH_PROVIDERS_CUSTOM (see search_providers.providers_from_env). A backup
+# starts when the one before it is slower than its SEARCH_HEDGE_QUANTILE
+# latency, or SEARCH_HEDGE_DELAY seconds until enough searches are measured.
+SEARCH_PROVIDERS = os.getenv("SEARCH_PROVIDERS", "ddg_html,ddg_lite")
+SEARCH_PROVIDERS_CUSTOM = os.getenv("SEARCH_PROVIDERS_CUSTOM")
+SEARCH_HEDGE_QUANTILE = float(os.getenv("SEARCH_HEDGE_QUANTILE", "0.9"))
+SEARCH_HEDGE_DELAY = float(os.getenv("SEARCH_HEDGE_DELAY", "1.0"))
+
+hedged_search = HedgedSearch(
+    providers_from_env(SEARCH_PROVIDERS, SEARCH_PROVIDERS_CUSTOM),
+    quantile=SEARCH_HEDGE_QUANTILE,
+    initial_delay=SEARCH_HEDGE_DELAY,
+)
+
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "512"))
+
+# normalized query -> (num_results requested, hits)
+search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+
+def normalize_query(query: str) -> str:
+    # the space goes too, so "what is x ?" and "what is x?" share a key
+    return " ".join(query.casefold().split()).strip("?!. ")
+
+async def web_search(query: str, num_results: int = 5, timeout: float = SEARCH_TIMEOUT):
+    with tracer.span("search", num_results=num_results) as span:
+        key = normalize_query(query)
+        # A cached set serves any smaller request, and any request at all if the page ran out of hits
+        cached = search_cache.get(
+            key, accept=lambda v: num_results <= v[0] or len(v[1]) < v[0]
+        )
+        if cached is not None:
+            CACHE_LOOKUPS.labels("search", "hit").inc()
+            span.set(cache="hit", hits=len(cached[1][:num_results]))
+            return cached[1][:num_results]
+        CACHE_LOOKUPS.labels("search", "miss").inc()
+
+        # every provider's request must end within the one search timeout
+        give_up = time.monotonic() + timeout
+        provider, hits, hedged = await hedged_search.search(
+            lambda p: _search_provider(p, query, num_results, give_up - time.monotonic()), num_results,
+        )
+        if provider:
+            SEARCH_WINS.labels(provider).inc()
+        if hedged:
+            SEARCH_HEDGES.inc()
+        if hits:
+            search_cache.set(key, (num_results, hits))
+        span.set(cache="miss", hits=len(hits), provider=provider, hedged=hedged)
+        return hits
 
-    return hits
+async def _search_provider(provider, query: str, num_results: int, timeout: float):
+    with tracer.span("search_provider", provider=provider.name) as span:
+        try:
+            with SEARCH_SECONDS.labels(provider.name).time():
+                r = await get_http_client().get(provider.url(query), timeout=max(timeout, 0.001))
+            span.set(status=r.status_code, bytes=len(r.content))
+            r.raise_for_status()
+        except Exception as e:
+            print(f"{provider.name} search error:", e)
+            ERRORS.labels("search").inc()
+            span.set(error=str(e))
+            return []
+
+        with tracer.span("parse", kind="search"):
+            hits = await run_blocking(parse_search, provider, r.text, num_results)
+        span.set(hits=len(hits))
+        return hits
+
+def parse_search(provider, html: str, num_results: int) -> List[dict]:
+    with PARSE_SECONDS.labels("search").time():
+        return provider.hits(html_parser, html, num_results)
 
 # — Content extraction (with snippet fallback) —
-def extract_content(url: str, max_length: int = 8000):
-    headers = {"User-Agent": "Mozilla/5.0", "Accept": "text/html"}
-    try:
-        r = requests.get(url, headers=headers, timeout=15)
-        r.raise_for_status()
-        if "text/html" not in r.headers.get("Content-Type", ""):
+CONTENT_CACHE_PATH = os.getenv("CONTENT_CACHE_PATH", "content_cache.db")
+CONTENT_CACHE_MAX_AGE = float(os.getenv("CONTENT_CACHE_MAX_AGE", "86400"))
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+content_cache = ContentCache(CONTENT_CACHE_PATH, CONTENT_CACHE_MAX_AGE, CONTENT_CACHE_MAX_BYTES)
+
+FETCH_TIMEOUT = 15.0
+
+# Bodies are streamed and cut off here; we only keep max_length chars of text anyway
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))
+
+async def read_capped(r: httpx.Response, limit: int) -> bytes:
+    chunks, size = [], 0
+    async for chunk in r.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return b"".join(chunks)[:limit]
+
+def parse_page(body: bytes, charset: Optional[str], max_length: int) -> str:
+    with PARSE_SECONDS.labels("page").time():
+        return html_parser.extract_text(decode_html(body, charset), max_length)
+
+# Hosts that keep timing out or erroring are skipped (straight to the snippet)
+# until a probe after BREAKER_RESET seconds succeeds; single failed URLs are
+# remembered for NEGATIVE_CACHE_TTL seconds
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "300"))
+NEGATIVE_CACHE_SIZE = int(os.getenv("NEGATIVE_CACHE_SIZE", "4096"))
+
+host_breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+OPEN_CIRCUITS.set_function(host_breaker.open_count)
+# canonical URL -> why it failed
+negative_cache = TTLCache(maxsize=NEGATIVE_CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL)
+
+def url_only_failure(e: Exception) -> bool:
+    """A missing page says nothing about the host's health."""
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code in (404, 410)
+
+# Concurrent requests for the same page (from any query) share one fetch
+fetch_flight = SingleFlight()
+
+async def extract_content(url: str, max_length: int = 8000):
+    with tracer.span("extract_content", host=host_of(url)) as span:
+        try:
+            key = canonical_url(url)
+        except ValueError as e:
+            # a bad port or bracket: nothing to fetch, so the hit keeps its snippet
+            span.set(error=f"ValueError: {e}", fallback=True)
             return ""
-    except Exception:
+        text = await fetch_flight.do((key, max_length), _extract_content, url, key, max_length)
+        span.set(chars=len(text), fallback=not text)
+        return text
+
+async def _extract_content(url: str, key: str, max_length: int):
+    entry = await run_blocking(content_cache.get, key)
+    if entry and entry.max_length != max_length:
+        entry = None
+    span = tracer.current()
+    if entry and content_cache.is_fresh(entry):
+        CACHE_LOOKUPS.labels("content", "hit").inc()
+        span.set(cache="hit")
+        return entry.text
+
+    # a stale copy, if any, still beats falling back to the snippet
+    host = host_of(url) or ""
+    if negative_cache.get(key) is not None:
+        FETCH_SKIPPED.labels("negative_cache").inc()
+        span.set(cache="miss", skipped="negative_cache")
+        return entry.text if entry else ""
+    if not host_breaker.allow(host):
+        FETCH_SKIPPED.labels("circuit_open").inc()
+        span.set(cache="miss", skipped="circuit_open")
+        return entry.text if entry else ""
+
+    outcome = error = None
+    try:
+        outcome, r, body, error = await _fetch_page(url, host, entry)
+    finally:
+        # None (cancelled before the host answered) only frees a half-open probe
+        healthy = None if outcome is None else outcome != "error" or url_only_failure(error)
+        host_breaker.record(host, healthy)
+
+    if outcome == "not_modified":
+        CACHE_LOOKUPS.labels("content", "revalidated").inc()
+        span.set(cache="revalidated")
+        await run_blocking(content_cache.touch, key)
+        return entry.text
+    CACHE_LOOKUPS.labels("content", "miss").inc()
+    span.set(cache="miss")
+    if outcome != "ok":
+        negative_cache.set(key, type(error).__name__ if error else outcome)
+        if outcome == "error":
+            span.set(stale=entry is not None)
+            return entry.text if entry else ""
         return ""
 
-    soup = BeautifulSoup(r.text, "html.parser")
-    for tag in soup(["script","style","nav","footer","header","aside","iframe","noscript","advertisement"]):
-        tag.extract()
+    with tracer.span("parse", kind="page", bytes=len(body)) as parse:
+        try:
+            text = await run_blocking(parse_page, body, r.charset_encoding, max_length)
+        except Exception as e:
+            # one unreadable page falls back to its snippet instead of failing the request
+            print("Parse error:", url, e)
+            ERRORS.labels("parse").inc()
+            parse.set(error=f"{type(e).__name__}: {e}")
+            return entry.text if entry else ""
+        parse.set(chars=len(text))
+    if text:
+        await run_blocking(
+            content_cache.put, key, text,
+            r.headers.get("ETag"), r.headers.get("Last-Modified"), max_length,
+        )
+    return text
 
-    main = None
-    for sel in ["main","article",".content",".post",".article",".main-content"]:
-        found = soup.select(sel)
-        if found:
-            main = found
-            break
+async def _fetch_page(url: str, host: str, entry):
+    """(outcome, response, body, error): outcome is ok, not_modified (304 for
+    our cached copy), not_html or error. Conditional when `entry` has validators."""
+    headers = {"Accept": "text/html"}
+    if entry and entry.etag:
+        headers["If-None-Match"] = entry.etag
+    if entry and entry.last_modified:
+        headers["If-Modified-Since"] = entry.last_modified
+    started = None
+    with tracer.span("fetch", host=host, conditional=entry is not None) as fetch:
+        try:
+            async with fetch_scheduler.slot(host) as waited:
+                FETCH_QUEUE_SECONDS.observe(waited)
+                fetch.set(queue_ms=round(waited * 1000, 3))
+                started = time.perf_counter()
+                async with get_http_client().stream("GET", url, headers=headers, timeout=FETCH_TIMEOUT) as r:
+                    fetch.set(status=r.status_code)
+                    if r.status_code == 304 and entry:
+                        outcome, body = "not_modified", None
+                    else:
+                        r.raise_for_status()
+                        # judged on headers alone, so non-HTML bodies are never downloaded
+                        if "text/html" not in r.headers.get("Content-Type", ""):
+                            outcome, body = "not_html", None
+                            fetch.set(content_type=r.headers.get("Content-Type", ""))
+                        else:
+                            outcome, body = "ok", await read_capped(r, FETCH_MAX_BYTES)
+        except Exception as e:
+            if started is not None:
+                FETCH_SECONDS.labels("error").observe(time.perf_counter() - started)
+            ERRORS.labels("fetch").inc()
+            fetch.set(outcome="error", error=f"{type(e).__name__}: {e}")
+            return "error", None, None, e
+
+        FETCH_SECONDS.labels(outcome).observe(time.perf_counter() - started)
+        fetch.set(outcome=outcome)
+        if body is not None:
+            FETCH_BYTES.observe(len(body))
+            fetch.set(bytes=len(body))
+        return outcome, r, body, None
 
-    if main:
-        text = " ".join(sec.get_text(separator=" ", strip=True) for sec in main)
-    else:
-        paras = soup.find_all("p")
-        text = " ".join(p.get_text(strip=True) for p in paras) if paras else soup.get_text(separator=" ", strip=True)
+def with_content(hit: dict, content: str) -> dict:
+    if not content:
+        SNIPPET_FALLBACKS.inc()
+    return {**hit, "content": content or hit["snippet"]}
 
-    text = " ".join(text.split())
-    return text[:max_length] + "..." if len(text) > max_length else text
+async def cancel_stragglers(tasks):
+    """Cancel extractions still running when their budget ran out; they fall back to the snippet."""
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        FETCHES_CANCELLED.inc(len(tasks))
+        await asyncio.wait(tasks)
+
+def extracted_text(task) -> str:
+    """A finished extraction's text; one that raised falls back to the snippet."""
+    try:
+        return task.result()
+    except Exception as e:
+        print("Extraction error:", e)
+        ERRORS.labels("extract").inc()
+        return ""
+
+async def enrich_results(hits: List[dict], timeout: Optional[float] = None):
+    tasks = [asyncio.ensure_future(extract_content(hit["url"])) for hit in hits]
+    if not tasks:
+        return []
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    await cancel_stragglers(pending)
+    # results stay in search rank order regardless of which page finished first
+    return [with_content(hit, "" if task in pending else extracted_text(task)) for hit, task in zip(hits, tasks)]
 
 # — Summarization (new v1.0.0 interface) —
-def summarize_content(query: str, items: List[dict]):
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", "3600"))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))
+SUMMARY_CACHE_MAX_CHARS = int(os.getenv("SUMMARY_CACHE_MAX_CHARS", str(8 * 1024 * 1024)))
+
+# sha256(model, system, user) -> summary text
+summary_cache = TTLCache(
+    maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL,
+    max_weight=SUMMARY_CACHE_MAX_CHARS, weigh=len,
+)
+
+def prompt_fingerprint(model: str, system: str, user: str) -> str:
+    h = hashlib.sha256()
+    for part in (model, system, user):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def build_prompt(query: str, items: List[dict]):
     system = "You are a research assistant that creates concise, accurate summaries."
     user = f'Query: "{query}"\n\n'
     for i, it in enumerate(items[:5], 1):
@@ -182,51 +486,261 @@ def summarize_content(query: str, items: List[dict]):
             f"Excerpt: {excerpt}\n\n---\n\n"
         )
     user += "Please provide a concise summary in 5–10 bullet points."
+    return system, user
 
-    try:
-        client = genai.Client(api_key=API_KEY)
-        response = client.models.generate_content(
-            model = MODEL,
-            contents = user,
-        )
-        return response.text.strip()
-    except Exception as e:
-        # return the real error so you can debug
-        return f"Failed to generate summary: {e}"
+async def summarize_content(query: str, items: List[dict], timeout: Optional[float] = None):
+    """The summary text; raises SummaryError when Gemini cannot produce one."""
+    with tracer.span("summarize_content", model=MODEL, mode="complete") as span:
+        system, user = build_prompt(query, items)
+        key = prompt_fingerprint(MODEL, system, user)
+        cached = summary_cache.get(key)
+        if cached is not None:
+            CACHE_LOOKUPS.labels("summary", "hit").inc()
+            span.set(cache="hit")
+            return cached
+        CACHE_LOOKUPS.labels("summary", "miss").inc()
+        PROMPT_CHARS.observe(len(user))
+        span.set(cache="miss", prompt_chars=len(user))
 
-# — Endpoints —
-@app.post("/research", response_model=ResearchResponse)
-async def perform_research(q: Query):
-    raw = search_duckduckgo(q.text, q.num_results)
+        try:
+            with GEMINI_SECONDS.labels("complete").time():
+                summary = await gemini.generate(MODEL, user, timeout=timeout)
+        except SummaryError as e:
+            ERRORS.labels("summarize").inc()
+            span.set(error=e.message, error_kind=e.kind, attempts=e.attempts)
+            raise
+        summary_cache.set(key, summary)
+        return summary
+
+async def stream_summary(query: str, items: List[dict], timeout: Optional[float] = None):
+    """Like summarize_content, but yields text chunks as Gemini produces them.
+    Raises SummaryError, possibly after some chunks, if the summary fails."""
+    with tracer.span("summarize_content", model=MODEL, mode="stream") as span:
+        system, user = build_prompt(query, items)
+        key = prompt_fingerprint(MODEL, system, user)
+        cached = summary_cache.get(key)
+        if cached is not None:
+            CACHE_LOOKUPS.labels("summary", "hit").inc()
+            span.set(cache="hit")
+            yield cached
+            return
+        CACHE_LOOKUPS.labels("summary", "miss").inc()
+        PROMPT_CHARS.observe(len(user))
+        span.set(cache="miss", prompt_chars=len(user))
+
+        # The Gemini stream is read by its own task: a timeout can then cancel it
+        # cleanly instead of interrupting whatever our caller does between chunks
+        chunks = asyncio.Queue()
+
+        async def pump():
+            try:
+                async for text in gemini.stream(MODEL, user, timeout=timeout):
+                    chunks.put_nowait(text)
+                chunks.put_nowait(None)
+            except SummaryError as e:
+                chunks.put_nowait(e)
+
+        parts = []
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        expires = None if timeout is None else loop.time() + timeout
+        producer = asyncio.ensure_future(pump())
+        try:
+            while True:
+                wait = None if expires is None else max(0.0, expires - loop.time())
+                try:
+                    item = await asyncio.wait_for(chunks.get(), wait)
+                except TimeoutError:
+                    item = SummaryError(DEADLINE_EXCEEDED, "deadline exceeded")
+                if item is None:
+                    break
+                if isinstance(item, SummaryError):
+                    ERRORS.labels("summarize").inc()
+                    span.set(error=item.message, error_kind=item.kind, attempts=item.attempts)
+                    raise item
+                parts.append(item)
+                yield item
+        finally:
+            producer.cancel()
+        GEMINI_SECONDS.labels("stream").observe(time.perf_counter() - started)
+        summary_cache.set(key, "".join(parts).strip())
+
+# — Research pipeline —
+# Identical concurrent /research requests attach to one computation
+research_flight = SingleFlight()
+
+# Whole-request time limit. Search and extraction budget against what is left
+# after SUMMARY_RESERVE seconds (at most half the deadline) kept for Gemini;
+# summarization gets everything that remains.
+RESEARCH_DEADLINE = float(os.getenv("RESEARCH_DEADLINE", "30"))
+RESEARCH_DEADLINE_MAX = float(os.getenv("RESEARCH_DEADLINE_MAX", "120"))
+SUMMARY_RESERVE = float(os.getenv("SUMMARY_RESERVE", "10"))
+
+def new_deadline(seconds: Optional[float]) -> Deadline:
+    return Deadline(min(seconds or RESEARCH_DEADLINE, RESEARCH_DEADLINE_MAX), SUMMARY_RESERVE)
+
+async def run_research(text: str, num_results: int, deadline: Deadline):
+    raw = await web_search(text, num_results, timeout=deadline.budget(SEARCH_TIMEOUT))
     if not raw:
         raise HTTPException(404, detail="No search results found")
 
-    enriched = []
-    for hit in raw:
-        content = extract_content(hit["url"]) or hit["snippet"]
-        enriched.append({**hit, "content": content})
+    enriched = await enrich_results(raw, timeout=deadline.budget())
 
-    summary = summarize_content(q.text, enriched)
+    summary_error = None
+    try:
+        summary = await summarize_content(text, enriched, timeout=deadline.budget(reserved=False))
+    except SummaryError as e:
+        summary, summary_error = "", e.to_dict()
 
-    payload = {
-        "query": q.text,
+    return {
+        "query": text,
         "results": raw,
-        "summary": summary
+        "summary": summary,
+        "summary_error": summary_error,
     }
-    save_research(q.text, payload)
-    return payload
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def research_events(text: str, num_results: int, deadline: Deadline, trace_id: Optional[str] = None):
+    """Server-sent events for one research run: hits, extracted (one per URL, in
+    completion order), summary deltas, then done with the saved history id."""
+    with tracer.span(
+        "research", trace_id=trace_id, query=text, num_results=num_results, deadline=deadline.seconds, stream=True,
+    ):
+        raw = await web_search(text, num_results, timeout=deadline.budget(SEARCH_TIMEOUT))
+        if not raw:
+            yield sse_event("error", {"detail": "No search results found"})
+            return
+        yield sse_event("hits", {"query": text, "results": raw})
+
+        tasks = {asyncio.ensure_future(extract_content(hit["url"])): i for i, hit in enumerate(raw)}
+        enriched = [None] * len(raw)
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=deadline.budget(), return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break  # extraction budget spent
+                for task in done:
+                    i = tasks[task]
+                    content = extracted_text(task)
+                    enriched[i] = with_content(raw[i], content)
+                    yield sse_event("extracted", {
+                        "index": i,
+                        "url": raw[i]["url"],
+                        "fallback": not content,
+                        "chars": len(enriched[i]["content"]),
+                    })
+        finally:
+            # budget spent, or the client went away mid-extraction
+            await cancel_stragglers(pending)
+        for task in pending:
+            i = tasks[task]
+            enriched[i] = with_content(raw[i], "")
+            yield sse_event("extracted", {
+                "index": i,
+                "url": raw[i]["url"],
+                "fallback": True,
+                "timed_out": True,
+                "chars": len(enriched[i]["content"]),
+            })
+
+        parts = []
+        summary_error = None
+        try:
+            async for delta in stream_summary(text, enriched, timeout=deadline.budget(reserved=False)):
+                parts.append(delta)
+                yield sse_event("summary", {"delta": delta})
+        except SummaryError as e:
+            summary_error = e.to_dict()
+        summary = "".join(parts).strip()
+
+        payload = {
+            "query": text,
+            "results": raw,
+            "summary": summary,
+            "summary_error": summary_error,
+        }
+        with tracer.span("save_research"):
+            rid = await asyncio.wrap_future(await save_research(text, payload))
+        yield sse_event("done", {"id": rid, "summary": summary, "summary_error": summary_error})
+
+# — Endpoints —
+@app.post("/research", response_model=ResearchResponse)
+async def perform_research(q: Query, response: Response):
+    deadline = new_deadline(q.deadline)
+    with tracer.span("research", query=q.text, num_results=q.num_results, deadline=deadline.seconds) as span:
+        response.headers["X-Trace-Id"] = span.trace_id
+        key = (normalize_query(q.text), q.num_results)
+        try:
+            # a coalesced follower's trace lacks the spans recorded by the leader,
+            # and it shares the leader's deadline
+            shared = await research_flight.do(key, run_research, q.text, q.num_results, deadline)
+        except HTTPException as e:
+            # coalesced callers share the exception object, so each raises its own copy
+            raise HTTPException(e.status_code, detail=e.detail, headers={**(e.headers or {}), "X-Trace-Id": span.trace_id})
+        payload = {**shared, "query": q.text}
+        with tracer.span("save_research", queued=True):
+            await save_research(q.text, payload)
+        return payload
+
+@app.post("/research/stream")
+async def perform_research_stream(q: Query):
+    trace_id = new_trace_id()
+    return StreamingResponse(
+        research_events(q.text, q.num_results, new_deadline(q.deadline), trace_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Trace-Id": trace_id},
+    )
 
 @app.get("/history")
-async def history():
-    return get_research_history()
+async def history(
+    limit: int = QueryParam(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    summary_chars: int = QueryParam(0, ge=0, le=2000),
+):
+    try:
+        return await run_blocking(get_research_history, limit, cursor, summary_chars)
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
+
+@app.get("/history/search")
+async def history_search(
+    q: str,
+    limit: int = QueryParam(20, ge=1, le=100),
+    offset: int = QueryParam(0, ge=0),
+):
+    try:
+        return await run_blocking(search_research, q, limit, offset)
+    except ValueError as e:
+        raise HTTPException(400, detail=str(e))
 
 @app.get("/history/{rid}")
 async def history_item(rid: int):
-    rec = get_research_by_id(rid)
+    rec = await run_blocking(get_research_by_id, rid)
     if not rec:
         raise HTTPException(404, detail="Not found")
     return rec
 
+@app.get("/traces/{trace_id}")
+async def trace(trace_id: str):
+    """Spans of a recent trace; only available with the in-memory exporter."""
+    if not isinstance(tracer.exporter, InMemoryExporter):
+        raise HTTPException(404, detail="Traces are not kept in memory")
+    spans = tracer.exporter.get(trace_id)
+    if spans is None:
+        raise HTTPException(404, detail="Not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+@app.get("/metrics")
+async def metrics():
+    # on the event loop, so collectors never race the code that updates them
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
 @app.get("/")
 async def root():
     return {"message": "API is live"}
@@ -0,0 +1,95 @@
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Every label below takes a small fixed set of values (never URLs, hosts or
+# queries), so the number of series stays constant however much traffic we see.
+
+# Seconds, from sub-millisecond parses to slow page fetches and summaries
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 2097152, 4194304)
+
+SEARCH_SECONDS = Histogram(
+    "research_search_seconds", "Search result page request latency by provider",
+    ["provider"],  # ddg_html, ddg_lite and any configured in SEARCH_PROVIDERS_CUSTOM
+    buckets=LATENCY_BUCKETS,
+)
+FETCH_QUEUE_SECONDS = Histogram(
+    "research_fetch_queue_seconds", "Time a page fetch waited for its global and per-host slot",
+    buckets=LATENCY_BUCKETS,
+)
+FETCH_SECONDS = Histogram(
+    "research_fetch_seconds", "Page fetch latency by outcome",
+    ["outcome"],  # ok, not_modified, not_html, error
+    buckets=LATENCY_BUCKETS,
+)
+FETCH_BYTES = Histogram(
+    "research_fetch_bytes", "Bytes downloaded per page (after the FETCH_MAX_BYTES cap)", buckets=SIZE_BUCKETS,
+)
+PARSE_SECONDS = Histogram(
+    "research_parse_seconds", "HTML parse and text extraction latency",
+    ["kind"],  # search, page
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_SECONDS = Histogram(
+    "research_gemini_seconds", "Gemini summary latency, to the last streamed chunk when streaming",
+    ["mode"],  # complete, stream
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_QUEUE_SECONDS = Histogram(
+    "research_gemini_queue_seconds", "Time a summary waited for one of the GEMINI_CONCURRENCY slots",
+    buckets=LATENCY_BUCKETS,
+)
+PROMPT_CHARS = Histogram(
+    "research_gemini_prompt_chars", "Characters sent to Gemini per summary request", buckets=SIZE_BUCKETS,
+)
+SQLITE_SECONDS = Histogram(
+    "research_sqlite_seconds", "History database latency by operation",
+    ["op"],  # write, history, search, item
+    buckets=LATENCY_BUCKETS,
+)
+
+GEMINI_RETRIES = Counter(
+    "research_gemini_retries", "Gemini requests retried, by the kind of error that caused it",
+    ["kind"],  # rate_limited, unavailable
+)
+SNIPPET_FALLBACKS = Counter(
+    "research_snippet_fallbacks", "Results summarized from the search snippet because page text was unavailable",
+)
+CACHE_LOOKUPS = Counter(
+    "research_cache_lookups", "Cache lookups by cache and result",
+    ["cache", "result"],  # search|content|summary, hit|miss|revalidated
+)
+SEARCH_HEDGES = Counter(
+    "research_search_hedges", "Searches that started a backup provider because the one before was slow",
+)
+SEARCH_WINS = Counter(
+    "research_search_wins", "Searches answered by each provider",
+    ["provider"],
+)
+FETCHES_CANCELLED = Counter(
+    "research_fetches_cancelled", "Page extractions cancelled because the request's extraction budget ran out",
+)
+FETCH_SKIPPED = Counter(
+    "research_fetch_skipped", "Page fetches not attempted, by reason",
+    ["reason"],  # circuit_open, negative_cache
+)
+HISTORY_QUEUE_DEPTH = Gauge(
+    "research_history_queue_depth", "History rows queued for the background writer (capped at HISTORY_QUEUE_SIZE)",
+)
+HISTORY_BLOCKED = Counter(
+    "research_history_blocked", "History saves that found the writer queue full and had to wait",
+)
+HISTORY_FAILED = Counter(
+    "research_history_failed", "History rows lost because their batch failed to commit",
+)
+OPEN_CIRCUITS = Gauge(
+    "research_open_circuits", "Hosts whose circuit breaker is open or half-open",
+)
+ERRORS = Counter(
+    "research_errors", "Failures by pipeline stage",
+    ["stage"],  # search, fetch, parse, extract, summarize, save
+)
+
+
+def render():
+    """(body, content type) of the Prometheus text exposition."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,382 @@
+import codecs
+import re
+import urllib.parse
+from dataclasses import dataclass
+from typing import List, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # optional fast backend
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional fast backend
+    LexborHTMLParser = None
+
+# Boilerplate dropped before extracting page text
+REMOVED_TAGS = ["script", "style", "nav", "footer", "header", "aside", "iframe", "noscript", "advertisement"]
+# Main-content candidates, tried in order; the first that matches anything wins
+MAIN_SELECTORS = ["main", "article", ".content", ".post", ".article", ".main-content"]
+# BeautifulSoup never counts text inside these toward get_text(), so the other
+# backends drop them up front to produce the same output
+HIDDEN_TEXT_TAGS = ["template", "rt", "rp"]
+
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_:.-]+)""", re.I)
+_BOMS = [(codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16-le"), (codecs.BOM_UTF16_BE, "utf-16-be")]
+
+
+def _known_codec(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        codec = codecs.lookup(name.strip().strip("\"'")).name
+        # hex, rot13, zlib and friends look up fine, but bytes.decode refuses them
+        # (empty input would skip that check)
+        b"a".decode(codec, "ignore")
+    except (LookupError, TypeError):
+        return None
+    return codec
+
+
+def decode_html(body: bytes, declared: Optional[str] = None) -> str:
+    """Decode a page using its BOM, the Content-Type charset, or a <meta> charset
+    in the first 1024 bytes, in that order; UTF-8 otherwise. No content sniffing."""
+    for bom, name in _BOMS:
+        if body.startswith(bom):
+            return body[len(bom):].decode(name, errors="replace")
+    encoding = _known_codec(declared)
+    if encoding is None:
+        m = _META_CHARSET.search(body[:1024])
+        encoding = _known_codec(m.group(1).decode("ascii")) if m else None
+    return body.decode(encoding or "utf-8", errors="replace")
+
+
+@dataclass(frozen=True)
+class SearchLayout:
+    """CSS selectors that locate hits on a search result page.
+
+    `link` and `snippet` are looked up inside each `result` block. Pages without
+    per-hit blocks (DuckDuckGo lite puts title and snippet in separate table
+    rows) leave `result` unset: links and snippets are then paired in document
+    order, each snippet going to the closest link before it.
+    """
+
+    link: str
+    snippet: Optional[str] = None
+    result: Optional[str] = None
+
+
+DDG_HTML = SearchLayout(result=".result", link=".result__title a", snippet=".result__snippet")
+DDG_LITE = SearchLayout(link="a.result-link", snippet="td.result-snippet")
+
+
+_DDG_HOSTS = (None, "duckduckgo.com", "html.duckduckgo.com", "lite.duckduckgo.com")
+
+
+def resolve_result_url(raw: str) -> str:
+    """Unwrap DuckDuckGo's /l/?uddg=<target> redirect links, relative or
+    protocol-relative (//duckduckgo.com/l/?uddg=..., as on the lite page)."""
+    try:
+        parsed = urllib.parse.urlparse(raw)
+        host = parsed.hostname
+    except ValueError:  # malformed href; leave it for the caller to skip
+        return raw
+    if parsed.path == "/l/" and host in _DDG_HOSTS:
+        qs = urllib.parse.parse_qs(parsed.query)
+        return qs.get("uddg", [raw])[0]
+    return raw
+
+
+def paired_hits(items, num_results: int) -> List[dict]:
+    """Hits from (is_link, text, href) tuples in document order; see SearchLayout."""
+    hits = []
+    for is_link, text, href in items:
+        if is_link:
+            if len(hits) >= num_results:
+                break
+            hits.append({"title": text, "url": resolve_result_url(href), "snippet": ""})
+        elif hits and not hits[-1]["snippet"]:
+            hits[-1]["snippet"] = text
+    return hits
+
+
+class TextBudget:
+    """Collects whitespace-normalized words in document order and reports when it
+    holds more than `max_length` characters, so extraction can stop early.
+
+    The result is the same as joining all of the page's text, collapsing
+    whitespace and truncating, without materializing the whole document.
+    """
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+        self.words = []
+        self.size = -1  # length of " ".join(words)
+
+    def add(self, text: str) -> bool:
+        """Append the words of `text`; True once enough has been collected."""
+        for word in text.split():
+            self.words.append(word)
+            self.size += len(word) + 1
+            if self.size > self.max_length:
+                return True
+        return False
+
+    def text(self) -> str:
+        text = " ".join(self.words)
+        return text[:self.max_length] + "..." if len(text) > self.max_length else text
+
+
+def collect_text(budget: TextBudget, pieces) -> str:
+    for piece in pieces:
+        if budget.add(piece):
+            break
+    return budget.text()
+
+
+def _class_xpath(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+class ParserBackend:
+    """Turns raw HTML into search hits and readable page text.
+
+    Every backend must return exactly what BS4Backend returns for the same page.
+    """
+
+    name = ""
+
+    def search_hits(self, html: str, num_results: int, layout: SearchLayout = DDG_HTML) -> List[dict]:
+        raise NotImplementedError
+
+    def extract_text(self, html: str, max_length: int = 8000) -> str:
+        raise NotImplementedError
+
+
+class BS4Backend(ParserBackend):
+    """Reference implementation on BeautifulSoup's pure-Python html.parser."""
+
+    name = "html.parser"
+
+    def search_hits(self, html: str, num_results: int, layout: SearchLayout = DDG_HTML) -> List[dict]:
+        soup = BeautifulSoup(html, "html.parser")
+        if layout.result is None:
+            def items():
+                for el in soup.select(", ".join(filter(None, (layout.link, layout.snippet)))):
+                    if el.css.match(layout.link):
+                        yield True, el.get_text(strip=True), el.get("href", "")
+                    else:
+                        yield False, el.get_text(strip=True), None
+            return paired_hits(items(), num_results)
+        hits = []
+        for block in soup.select(layout.result):
+            link = block.select_one(layout.link)
+            if not link:
+                continue
+            title = link.get_text(strip=True)
+            href = resolve_result_url(link.get("href", ""))
+            snippet_el = block.select_one(layout.snippet) if layout.snippet else None
+            snippet = snippet_el.get_text(strip=True) if snippet_el else ""
+            hits.append({"title": title, "url": href, "snippet": snippet})
+            if len(hits) >= num_results:
+                break
+
+        return hits
+
+    def extract_text(self, html: str, max_length: int = 8000) -> str:
+        soup = BeautifulSoup(html, "html.parser")
+        for tag in soup(REMOVED_TAGS):
+            tag.extract()
+
+        main = None
+        for sel in MAIN_SELECTORS:
+            found = soup.select(sel)
+            if found:
+                main = found
+                break
+
+        if main:
+            pieces = (s for sec in main for s in sec.stripped_strings)
+        else:
+            paras = soup.find_all("p")
+            pieces = ("".join(p.stripped_strings) for p in paras) if paras else soup.stripped_strings
+        return collect_text(TextBudget(max_length), pieces)
+
+
+class LxmlBackend(ParserBackend):
+    """libxml2's C HTML parser, queried with precompiled XPath."""
+
+    name = "lxml"
+
+    def __init__(self):
+        self._results = etree.XPath(f"//*[{_class_xpath('result')}]")
+        # like soupsieve, the .result__title ancestor may sit anywhere above the link
+        self._link = etree.XPath(f".//a[ancestor::*[{_class_xpath('result__title')}]]")
+        self._snippet = etree.XPath(f".//*[{_class_xpath('result__snippet')}]")
+        self._main = [
+            etree.XPath(f"//*[{_class_xpath(sel[1:])}]" if sel.startswith(".") else f"//{sel}")
+            for sel in MAIN_SELECTORS
+        ]
+        self._drop = etree.XPath("//" + " | //".join(REMOVED_TAGS + HIDDEN_TEXT_TAGS))
+
+    def _parse(self, html: str):
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # str input may not carry an XML encoding declaration
+            return lxml.html.document_fromstring(html.encode("utf-8"))
+        except etree.ParserError:
+            return None
+
+    @staticmethod
+    def _strings(el):
+        for s in el.itertext():
+            s = s.strip()
+            if s:
+                yield s
+
+    def search_hits(self, html: str, num_results: int, layout: SearchLayout = DDG_HTML) -> List[dict]:
+        if layout != DDG_HTML:
+            # the XPath below is compiled for DuckDuckGo's HTML page only, and
+            # lxml needs the separate cssselect package to take CSS selectors
+            return BS4Backend().search_hits(html, num_results, layout)
+        doc = self._parse(html)
+        if doc is None:
+            return []
+        for el in doc.iter("template", "rt", "rp"):
+            el.drop_tree()
+        hits = []
+        for block in self._results(doc):
+            links = self._link(block)
+            if not links:
+                continue
+            link = links[0]
+            title = "".join(self._strings(link))
+            href = resolve_result_url(link.get("href", ""))
+            snippets = self._snippet(block)
+            snippet = "".join(self._strings(snippets[0])) if snippets else ""
+            hits.append({"title": title, "url": href, "snippet": snippet})
+            if len(hits) >= num_results:
+                break
+
+        return hits
+
+    def extract_text(self, html: str, max_length: int = 8000) -> str:
+        doc = self._parse(html)
+        if doc is None:
+            return ""
+        # emptied rather than dropped: drop_tree() would glue the element's tail
+        # onto the text before it ("before<script/>after" -> "beforeafter")
+        for el in self._drop(doc):
+            el.clear(keep_tail=True)
+
+        main = None
+        for xpath in self._main:
+            found = xpath(doc)
+            if found:
+                main = found
+                break
+
+        if main:
+            pieces = (s for sec in main for s in sec.itertext())
+        elif doc.find(".//p") is not None:
+            pieces = ("".join(self._strings(p)) for p in doc.iter("p"))
+        else:
+            pieces = doc.itertext()
+        return collect_text(TextBudget(max_length), pieces)
+
+
+class LexborBackend(ParserBackend):
+    """selectolax's bindings to the lexbor HTML5 parser and CSS engine."""
+
+    name = "lexbor"
+
+    @staticmethod
+    def _strings(node):
+        for n in node.traverse(include_text=True):
+            if n.tag == "-text":
+                s = n.text_content.strip()
+                if s:
+                    yield s
+
+    @staticmethod
+    def _texts(node):
+        # TextBudget splits on whitespace itself, so no per-node strip is needed
+        for n in node.traverse(include_text=True):
+            if n.tag == "-text":
+                yield n.text_content
+
+    def search_hits(self, html: str, num_results: int, layout: SearchLayout = DDG_HTML) -> List[dict]:
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(HIDDEN_TEXT_TAGS)
+        if layout.result is None:
+            def items():
+                for node in tree.css(", ".join(filter(None, (layout.link, layout.snippet)))):
+                    if node.css_matches(layout.link):
+                        yield True, "".join(self._strings(node)), node.attributes.get("href") or ""
+                    else:
+                        yield False, "".join(self._strings(node)), None
+            return paired_hits(items(), num_results)
+        hits = []
+        for block in tree.css(layout.result):
+            link = block.css_first(layout.link)
+            if link is None:
+                continue
+            title = "".join(self._strings(link))
+            href = resolve_result_url(link.attributes.get("href") or "")
+            snippet_el = block.css_first(layout.snippet) if layout.snippet else None
+            snippet = "".join(self._strings(snippet_el)) if snippet_el is not None else ""
+            hits.append({"title": title, "url": href, "snippet": snippet})
+            if len(hits) >= num_results:
+                break
+
+        return hits
+
+    def extract_text(self, html: str, max_length: int = 8000) -> str:
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(REMOVED_TAGS + HIDDEN_TEXT_TAGS)
+
+        main = None
+        for sel in MAIN_SELECTORS:
+            found = tree.css(sel)
+            if found:
+                main = found
+                break
+
+        if main:
+            pieces = (s for sec in main for s in self._texts(sec))
+        else:
+            paras = tree.css("p")
+            if paras:
+                pieces = ("".join(self._strings(p)) for p in paras)
+            else:
+                pieces = self._texts(tree.root) if tree.root is not None else ()
+        return collect_text(TextBudget(max_length), pieces)
+
+
+# Fastest first (see bench/parsers.py)
+BACKENDS = [
+    (LexborBackend, LexborHTMLParser is not None),
+    (LxmlBackend, lxml is not None),
+    (BS4Backend, True),
+]
+
+
+def available_backends() -> List[ParserBackend]:
+    return [cls() for cls, ok in BACKENDS if ok]
+
+
+def select_backend(name: Optional[str] = None) -> ParserBackend:
+    """The named backend if given (and installed), else the fastest available one."""
+    backends = available_backends()
+    if name:
+        for backend in backends:
+            if backend.name == name:
+                return backend
+        print(f"HTML parser {name!r} is not available, using {backends[0].name}")
+    return backends[0]
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class _Host:
+    __slots__ = ("waiters", "active", "next_start")
+
+    def __init__(self):
+        self.waiters = deque()
+        self.active = 0
+        self.next_start = 0.0
+
+
+class HostScheduler:
+    """Grants fetch slots under a global cap, a per-host cap and a minimum gap
+    between request starts to the same host.
+
+    Waiters queue per host, and free slots go round-robin across hosts that are
+    allowed to start, so one host with a long queue cannot starve the others.
+    Not thread-safe; use it from one event loop.
+    """
+
+    def __init__(self, total: int = 16, per_host: int = 2, min_interval: float = 0.0):
+        self.total = total
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._hosts = {}
+        self._ready = deque()  # hosts with waiters, in round-robin order
+        self._active = 0
+        self._timer = None
+        self._timer_at = 0.0
+        self.granted = 0
+        self.delayed = 0  # grants that had to wait for a cap or the spacing
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        """Hold a fetch slot for `host`; yields the seconds spent queueing."""
+        waited = await self.acquire(host)
+        try:
+            yield waited
+        finally:
+            self.release(host)
+
+    async def acquire(self, host: str) -> float:
+        started = time.monotonic()
+        h = self._hosts.get(host)
+        if h is None:
+            h = self._hosts[host] = _Host()
+        fut = asyncio.get_running_loop().create_future()
+        h.waiters.append(fut)
+        if len(h.waiters) == 1:
+            self._ready.append(host)
+        self._dispatch()
+        if not fut.done():
+            self.delayed += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(host)  # granted just as we were cancelled
+            elif fut in h.waiters:
+                h.waiters.remove(fut)
+                self._dispatch()
+            raise
+        return time.monotonic() - started
+
+    def release(self, host: str):
+        h = self._hosts[host]
+        h.active -= 1
+        self._active -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        soonest = None
+        while self._active < self.total and self._ready:
+            granted = False
+            for _ in range(len(self._ready)):
+                host = self._ready[0]
+                self._ready.rotate(-1)
+                h = self._hosts[host]
+                while h.waiters and h.waiters[0].done():  # cancelled while queued
+                    h.waiters.popleft()
+                if not h.waiters:
+                    self._ready.pop()
+                    continue
+                if h.active >= self.per_host:
+                    continue
+                if now < h.next_start:
+                    soonest = h.next_start if soonest is None else min(soonest, h.next_start)
+                    continue
+                fut = h.waiters.popleft()
+                if not h.waiters:
+                    self._ready.pop()
+                h.active += 1
+                h.next_start = now + self.min_interval
+                self._active += 1
+                self.granted += 1
+                fut.set_result(None)
+                granted = True
+                break
+            if not granted:
+                break
+        if soonest is not None and (self._timer is None or soonest < self._timer_at):
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer_at = soonest
+            self._timer = asyncio.get_running_loop().call_later(soonest - now, self._wake)
+        self._prune(now)
+
+    def _wake(self):
+        self._timer = None
+        self._dispatch()
+
+    def _prune(self, now: float):
+        # forget idle hosts once their spacing has passed so the table stays small
+        if len(self._hosts) <= 2 * self.total:
+            return
+        for host in [k for k, h in self._hosts.items() if not h.waiters and not h.active and h.next_start <= now]:
+            del self._hosts[host]
+
+    def stats(self):
+        return {
+            "active": self._active,
+            "queued": sum(len(h.waiters) for h in self._hosts.values()),
+            "hosts": len(self._hosts),
+            "granted": self.granted,
+            "delayed": self.delayed,
+        }
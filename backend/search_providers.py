@@ -0,0 +1,212 @@
+import asyncio
+import json
+import math
+import urllib.parse
+from collections import deque
+from typing import Dict, List, Optional
+
+from content_cache import canonical_url
+from parsing import DDG_HTML, DDG_LITE, SearchLayout
+
+
+class SearchProvider:
+    """One search engine result page: where to request it and how to read it.
+
+    Providers only build URLs and describe the page layout; the caller fetches
+    with its own HTTP client and parses with its own HTML backend.
+    """
+
+    name = ""
+    layout: SearchLayout = DDG_HTML
+
+    def url(self, query: str) -> str:
+        raise NotImplementedError
+
+    def hits(self, backend, html: str, num_results: int) -> List[dict]:
+        return backend.search_hits(html, num_results, self.layout)
+
+
+class DuckDuckGoHTML(SearchProvider):
+    name = "ddg_html"
+    layout = DDG_HTML
+
+    def url(self, query: str) -> str:
+        return f"https://html.duckduckgo.com/html/?q={urllib.parse.quote_plus(query)}"
+
+
+class DuckDuckGoLite(SearchProvider):
+    """The text-only endpoint: a smaller page that is often up when /html is throttled."""
+
+    name = "ddg_lite"
+    layout = DDG_LITE
+
+    def url(self, query: str) -> str:
+        return f"https://lite.duckduckgo.com/lite/?q={urllib.parse.quote_plus(query)}"
+
+
+class ConfiguredProvider(SearchProvider):
+    """A provider defined by configuration: a URL template with a `{query}`
+    placeholder and the CSS selectors of a SearchLayout."""
+
+    def __init__(self, name: str, url: str, link: str, snippet: Optional[str] = None, result: Optional[str] = None):
+        if "{query}" not in url:
+            raise ValueError(f"search provider {name!r}: url has no {{query}} placeholder")
+        self.name = name
+        self.template = url
+        self.layout = SearchLayout(link=link, snippet=snippet, result=result)
+
+    def url(self, query: str) -> str:
+        return self.template.replace("{query}", urllib.parse.quote_plus(query))
+
+
+BUILTIN_PROVIDERS = {cls.name: cls for cls in (DuckDuckGoHTML, DuckDuckGoLite)}
+
+
+def providers_from_env(names: str, custom: Optional[str] = None) -> List[SearchProvider]:
+    """Providers named in the comma-separated `names`, in order.
+
+    `custom` is a JSON list of ConfiguredProvider arguments, e.g.
+    [{"name": "searx", "url": "https://searx.example/search?q={query}",
+      "result": "article.result", "link": "h3 a", "snippet": "p.content"}].
+    Unknown names are skipped; with none left, DuckDuckGo HTML is used.
+    """
+    available = {name: cls() for name, cls in BUILTIN_PROVIDERS.items()}
+    if custom:
+        try:
+            for spec in json.loads(custom):
+                provider = ConfiguredProvider(**spec)
+                available[provider.name] = provider
+        except (TypeError, ValueError) as e:
+            print("Invalid custom search providers:", e)
+    providers = []
+    for name in (n.strip() for n in names.split(",")):
+        if not name:
+            continue
+        if name in available:
+            providers.append(available[name])
+        else:
+            print(f"Unknown search provider {name!r}, skipping")
+    return providers or [DuckDuckGoHTML()]
+
+
+def _dedupe_key(url: str) -> str:
+    try:
+        return canonical_url(url)
+    except ValueError:  # a malformed href (bad port, unclosed IPv6 bracket) is kept as is
+        return url
+
+
+def merge_hits(result_sets: List[List[dict]], num_results: int) -> List[dict]:
+    """Hits from the first set, topped up from the others, one per canonical URL."""
+    merged, seen = [], set()
+    for hits in result_sets:
+        for hit in hits:
+            key = _dedupe_key(hit["url"])
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(hit)
+            if len(merged) >= num_results:
+                return merged
+    return merged
+
+
+class HedgedSearch:
+    """Queries providers in order and hedges against a slow one.
+
+    The first provider starts alone. If it has not answered after its own
+    `quantile` latency (from its last `window` successful searches, clamped to
+    [min_delay, max_delay]; `initial_delay` until `min_samples` are in), the next
+    provider starts alongside it, and so on down the list. One that fails or
+    finds nothing hands over to the next straight away. The first non-empty
+    result set wins, topped up with hits from any set that arrived together
+    with it; providers still running are cancelled.
+    """
+
+    def __init__(
+        self,
+        providers: List[SearchProvider],
+        quantile: float = 0.9,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.05,
+        max_delay: float = 5.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.providers = providers
+        self.quantile = quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self._latency = {p.name: deque(maxlen=window) for p in providers}
+        self.hedged = 0
+        self.wins: Dict[str, int] = {p.name: 0 for p in providers}
+
+    def hedge_delay(self, provider: SearchProvider) -> float:
+        samples = self._latency[provider.name]
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        ranked = sorted(samples)
+        value = ranked[min(len(ranked) - 1, math.ceil(self.quantile * len(ranked)) - 1)]
+        return min(max(value, self.min_delay), self.max_delay)
+
+    async def search(self, run, num_results: int):
+        """(winning provider name or None, hits, whether a backup was started
+        for slowness). `run(provider)` fetches and parses one provider's page and
+        returns its hits, [] on failure."""
+        loop = asyncio.get_running_loop()
+        waiting = list(self.providers)
+        running = {}  # task -> (provider, started)
+        answered = []  # (provider, hits) with hits, in arrival order
+        last_started = 0.0
+        hedged = False
+
+        def start_next():
+            nonlocal last_started
+            provider = waiting.pop(0)
+            last_started = loop.time()
+            running[asyncio.ensure_future(run(provider))] = (provider, last_started)
+
+        start_next()
+        try:
+            while running and not answered:
+                timeout = None
+                if waiting:
+                    newest = list(running.values())[-1][0]
+                    timeout = max(0.0, last_started + self.hedge_delay(newest) - loop.time())
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.hedged += 1
+                    hedged = True
+                    start_next()
+                    continue
+                for task in done:
+                    provider, started = running.pop(task)
+                    try:
+                        hits = task.result()
+                    except Exception as e:
+                        print(f"Search provider {provider.name} error:", e)
+                        hits = []
+                    if hits:
+                        self._latency[provider.name].append(loop.time() - started)
+                        answered.append((provider, hits))
+                    elif waiting:
+                        start_next()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.wait(running)
+        if not answered:
+            return None, [], hedged
+        winner = answered[0][0]
+        self.wins[winner.name] += 1
+        return winner.name, merge_hits([hits for _, hits in answered], num_results), hedged
+
+    def stats(self):
+        return {
+            "hedged": self.hedged,
+            "wins": dict(self.wins),
+            "hedge_delay": {p.name: round(self.hedge_delay(p), 3) for p in self.providers},
+        }
@@ -0,0 +1,58 @@
+import asyncio
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one in-flight execution.
+
+    The first caller starts `fn`; callers arriving while it runs await the same
+    task and receive its result (or exception). The task is shielded, so one
+    caller disconnecting does not cancel the work the others are waiting on; once
+    every caller has been cancelled, nobody wants the result and it is cancelled too.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._waiters = {}  # task -> callers awaiting it
+        self.started = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.started += 1
+        else:
+            self.shared += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters[task] == 1:
+                task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _forget(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # mark the exception retrieved even if every waiter went away
+            task.exception()
+
+    def __len__(self):
+        return len(self._inflight)
+
+    def stats(self):
+        return {
+            "inflight": len(self._inflight),
+            "started": self.started,
+            "shared": self.shared,
+            "abandoned": self.abandoned,
+        }
@@ -0,0 +1,173 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+
+class Span:
+    """One timed operation. Spans opened while another is current become its
+    children and share its trace id; the root span's trace is exported when it ends."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "end", "attributes", "status", "_trace")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], trace: list):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.attributes = {}
+        self.status = "ok"
+        self._trace = trace
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end is None else (self.end - self.start) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3) if self.end is not None else None,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Receives every finished trace as a list of spans, root last."""
+
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def shutdown(self):
+        pass
+
+
+class NoopExporter(SpanExporter):
+    def export(self, spans: List[Span]):
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps the last `maxsize` traces for lookup by id."""
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._traces[spans[-1].trace_id] = [s.to_dict() for s in spans]
+            while len(self._traces) > self.maxsize:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[List[dict]]:
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+class JsonFileExporter(SpanExporter):
+    """Appends one JSON line per trace: {"trace_id", "spans": [...]}."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, spans: List[Span]):
+        line = json.dumps({"trace_id": spans[-1].trace_id, "spans": [s.to_dict() for s in spans]})
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def new_trace_id() -> str:
+    return os.urandom(16).hex()
+
+
+class Tracer:
+    """Creates spans and hands finished traces to the exporter.
+
+    The current span lives in a contextvar, so tasks started with asyncio inherit
+    their creator's span. Work handed to a thread pool does not; wrap the await
+    instead.
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        self.exporter = exporter or NoopExporter()
+
+    @contextmanager
+    def span(self, name: str, trace_id: Optional[str] = None, **attributes):
+        parent = _current.get()
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, parent._trace)
+        else:
+            span = Span(name, trace_id or new_trace_id(), None, [])
+        span.attributes.update(attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes.setdefault("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.end = time.time()
+            try:
+                _current.reset(token)
+            except ValueError:
+                # an async generator finalized from another task
+                _current.set(parent)
+            span._trace.append(span)
+            if parent is None:
+                try:
+                    self.exporter.export(span._trace)
+                except Exception as e:
+                    print("Trace export error:", e)
+
+    def current(self) -> Span:
+        """The current span, or a detached one (never exported) outside any trace."""
+        return _current.get() or Span("detached", "", None, [])
+
+    def shutdown(self):
+        self.exporter.shutdown()
+
+
+def exporter_from_env(kind: Optional[str], path: Optional[str], maxsize: int) -> SpanExporter:
+    """`memory` (default), `jsonl` (to `path`) or `none`."""
+    kind = (kind or "memory").lower()
+    if kind == "none":
+        return NoopExporter()
+    if kind == "jsonl":
+        return JsonFileExporter(path or "traces.jsonl")
+    if kind != "memory":
+        print(f"Unknown trace exporter {kind!r}, using memory")
+    return InMemoryExporter(maxsize)
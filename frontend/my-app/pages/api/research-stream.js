@@ -0,0 +1,59 @@
+// Streams server-sent events from the backend as they arrive (no overall timeout)
+export const config = { api: { responseLimit: false } };
+
+export default async function handler(req, res) {
+    if (req.method !== "POST") {
+      return res.status(405).json({ message: "Method not allowed" });
+    }
+    const { text, num_results } = req.body;
+    if (!text || typeof text !== "string") {
+      return res.status(400).json({ message: "Invalid request: text is required" });
+    }
+  
+    // stop the backend work if the browser goes away. The request's own "close"
+    // fires once its body has been read, so watch the response instead; it also
+    // closes after a normal finish, which must not abort anything
+    const controller = new AbortController();
+    res.on("close", () => {
+      if (!res.writableFinished) controller.abort();
+    });
+  
+    try {
+      const backend = await fetch("http://localhost:8000/research/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ text, num_results: num_results || 5 }),
+        signal: controller.signal,
+      });
+  
+      if (!backend.ok) {
+        const err = await backend.json().catch(() => ({}));
+        throw new Error(err.detail || err.message || `Status ${backend.status}`);
+      }
+  
+      res.writeHead(200, {
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache, no-transform",
+        Connection: "keep-alive",
+      });
+      const reader = backend.body.getReader();
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        res.write(value);
+      }
+      res.end();
+    } catch (err) {
+      if (err.name === "AbortError") {
+        return res.end();
+      }
+      console.error("Proxy stream error:", err);
+      if (res.headersSent) {
+        return res.end();
+      }
+      return res.status(500).json({
+        message: err.message || "Internal server error",
+        ...(process.env.NODE_ENV === "development" && { stack: err.stack }),
+      });
+    }
+  }
@@ -1,3 +1,8 @@
+// The backend is asked to finish a little before we give up on it, so its
+// deadline budget (search, extraction, summary reserve) applies to UI requests
+const TIMEOUT_MS = 10_000;
+const BACKEND_DEADLINE_S = 9;
+
 export default async function handler(req, res) {
     if (req.method !== "POST") {
       return res.status(405).json({ message: "Method not allowed" });
@@ -9,13 +14,13 @@ export default async function handler(req, res) {
   
     // 10s timeout via AbortController
     const controller = new AbortController();
-    const timeout = setTimeout(() => controller.abort(), 10_000);
+    const timeout = setTimeout(() => controller.abort(), TIMEOUT_MS);
   
     try {
       const backend = await fetch("http://localhost:8000/research", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ text, num_results: num_results || 5 }),
+        body: JSON.stringify({ text, num_results: num_results || 5, deadline: BACKEND_DEADLINE_S }),
         signal: controller.signal,
       });
   
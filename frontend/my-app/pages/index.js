@@ -90,9 +90,16 @@ export default function Home() {
       {results && (
         <div className="mt-8">
           <h2 className="text-2xl font-bold mb-2">Summary</h2>
-          <div className="whitespace-pre-line bg-gray-100 p-4 rounded">
-            {results.summary}
-          </div>
+          {results.summary && (
+            <div className="whitespace-pre-line bg-gray-100 p-4 rounded">
+              {results.summary}
+            </div>
+          )}
+          {results.summary_error && (
+            <div className="mt-2 p-3 bg-yellow-100 text-yellow-800 rounded">
+              Summary unavailable: {results.summary_error.message}
+            </div>
+          )}
 
           <h2 className="text-2xl font-bold mt-6 mb-2">Sources</h2>
           <ul className="space-y-4">